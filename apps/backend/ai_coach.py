@@ -1,20 +1,31 @@
 import os
 from dotenv import load_dotenv
 load_dotenv()
+import asyncio
 import httpx
-from typing import Optional
-from postgres_client import db_client
+from typing import Dict, Iterable, Optional, Tuple
+from postgres_client import async_db_client
+from cache import TTLCache
 from datetime import datetime
 
 # OpenRouter API configuration
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
+# AI calorie estimates are cached per normalized food description; only AI answers are cached,
+# so a description that fell back to the keyword estimate is asked about again next time
+CALORIE_CACHE_TTL = float(os.getenv("CALORIE_CACHE_TTL", "86400"))
+CALORIE_ESTIMATE_CONCURRENCY = int(os.getenv("CALORIE_ESTIMATE_CONCURRENCY", "4"))
+calorie_cache = TTLCache(maxsize=10000, ttl=CALORIE_CACHE_TTL)
+
+def _calorie_key(food_description: str) -> str:
+    return " ".join(food_description.lower().split())
+
 async def generate_motivation(user_id: int, guilt_rating: int, regret_rating: int, custom_message: Optional[str] = None) -> str:
     """Generate AI-powered motivation message based on user's guilt and regret ratings"""
     print("we are in generate_motivation func in ai coach.py")
     # Get user's recent patterns
-    recent_logs = db_client.execute_query(
+    recent_logs = await async_db_client.execute_query(
         "SELECT * FROM junk_food_logs WHERE user_id = %s ORDER BY created_at DESC LIMIT 10",
         (user_id,)
     )
@@ -168,6 +179,10 @@ def get_fallback_motivation(guilt_rating: int, regret_rating: int, total_logs_we
 async def estimate_calories(food_description: str) -> int:
     """Estimate calories from food description using AI or fallback"""
     
+    cached = calorie_cache.get(_calorie_key(food_description))
+    if cached is not None:
+        return cached
+    
     if not OPENROUTER_API_KEY:
         return get_fallback_calories(food_description)
     
@@ -200,13 +215,42 @@ async def estimate_calories(food_description: str) -> int:
                 calories_text = result["choices"][0]["message"]["content"].strip()
                 # Extract number from response
                 calories = int(''.join(filter(str.isdigit, calories_text)))
-                return min(max(calories, 50), 2000)  # Reasonable bounds
+                calories = min(max(calories, 50), 2000)  # Reasonable bounds
+                calorie_cache.set(_calorie_key(food_description), calories)
+                return calories
             else:
                 return get_fallback_calories(food_description)
                 
     except Exception:
         return get_fallback_calories(food_description)
 
+async def estimate_calories_many(food_descriptions: Iterable[str], max_requests: int) -> Tuple[Dict[str, int], int]:
+    """Estimate each distinct description once.
+
+    Cached estimates are used first, then at most max_requests AI calls run
+    CALORIE_ESTIMATE_CONCURRENCY at a time; the rest get the keyword fallback.
+    Returns the estimates by description and the number of AI calls made.
+    """
+    estimates: Dict[str, int] = {}
+    to_request = []
+    for description in dict.fromkeys(food_descriptions):
+        cached = calorie_cache.get(_calorie_key(description))
+        if cached is not None:
+            estimates[description] = cached
+        elif OPENROUTER_API_KEY and len(to_request) < max_requests:
+            to_request.append(description)
+        else:
+            estimates[description] = get_fallback_calories(description)
+    
+    semaphore = asyncio.Semaphore(CALORIE_ESTIMATE_CONCURRENCY)
+    
+    async def estimate(description: str):
+        async with semaphore:
+            estimates[description] = await estimate_calories(description)
+    
+    await asyncio.gather(*(estimate(description) for description in to_request))
+    return estimates, len(to_request)
+
 def get_fallback_calories(food_description: str) -> int:
     """Fallback calorie estimation based on common junk foods"""
     
@@ -236,7 +280,7 @@ async def analyze_patterns(user_id: int) -> str:
     """Analyze user patterns and provide insights"""
     
     # Get recent logs
-    logs = db_client.execute_query(
+    logs = await async_db_client.execute_query(
         "SELECT * FROM junk_food_logs WHERE user_id = %s ORDER BY created_at DESC LIMIT 20",
         (user_id,)
     )
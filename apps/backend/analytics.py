@@ -0,0 +1,144 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from postgres_client import async_db_client, AsyncPostgreSQLClient
+
+# Long-range analytics over a user's raw logs. The logs in a range are fetched once as columns
+# (one array per field) and every view below is computed from those arrays with vectorized
+# NumPy ops, so a multi-year history costs one query plus a few passes in C, not a Python loop per log.
+
+# Days of recent spending the cost projections are based on
+PROJECTION_BASIS_DAYS = 90
+PROJECTION_HORIZONS = (30, 90, 365)
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+class LogArrays:
+    """A user's logs as parallel columns ordered by created_at; missing ratings/costs are NaN"""
+
+    def __init__(self, created_at, guilt, regret, cost, calories):
+        self.created_at = np.asarray(created_at, dtype="int64").astype("datetime64[s]")  # UTC
+        self.guilt = np.asarray(guilt, dtype=float)
+        self.regret = np.asarray(regret, dtype=float)
+        self.cost = np.asarray(cost, dtype=float)
+        self.calories = np.asarray(calories, dtype=float)
+
+    def __len__(self) -> int:
+        return len(self.created_at)
+
+async def load_logs(user_id: int, start: date, end: date, client: AsyncPostgreSQLClient = async_db_client) -> LogArrays:
+    """Fetch the user's logs from start to end (inclusive, UTC) as a single row of arrays"""
+    rows = await client.execute_query(
+        """
+        SELECT
+            COALESCE(array_agg(extract(epoch FROM created_at)::bigint ORDER BY created_at), '{}') AS created_at,
+            COALESCE(array_agg(guilt_rating ORDER BY created_at), '{}') AS guilt,
+            COALESCE(array_agg(regret_rating ORDER BY created_at), '{}') AS regret,
+            COALESCE(array_agg(estimated_cost::float8 ORDER BY created_at), '{}') AS cost,
+            COALESCE(array_agg(estimated_calories ORDER BY created_at), '{}') AS calories
+        FROM junk_food_logs
+        WHERE user_id = %s AND created_at >= %s AND created_at < %s
+        """,
+        (user_id, start, end + timedelta(days=1))
+    )
+    row = rows[0]
+    return LogArrays(row["created_at"], row["guilt"], row["regret"], row["cost"], row["calories"])
+
+def _sums(groups: np.ndarray, size: int, logs: LogArrays) -> Dict[str, np.ndarray]:
+    """Per-group counts and sums, where groups[i] is the group index of log i"""
+    sums = {
+        "count": np.bincount(groups, minlength=size),
+        "cost": np.bincount(groups, weights=np.nan_to_num(logs.cost), minlength=size),
+        "calories": np.bincount(groups, weights=np.nan_to_num(logs.calories), minlength=size),
+    }
+    for name, values in (("guilt", logs.guilt), ("regret", logs.regret)):
+        rated = ~np.isnan(values)
+        sums[name] = np.bincount(groups[rated], weights=values[rated], minlength=size)
+        sums[f"{name}_count"] = np.bincount(groups[rated], minlength=size)
+    return sums
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return numerator / denominator  # NaN where there is nothing to average
+
+def _json_floats(values: np.ndarray, ndigits: int) -> List[Optional[float]]:
+    return [None if value != value else round(value, ndigits) for value in values.tolist()]
+
+def period_trends(logs: LogArrays, unit: str) -> List[Dict[str, Any]]:
+    """Totals and averages per calendar month ("M") or year ("Y") that has logs"""
+    labels, groups = np.unique(logs.created_at.astype(f"datetime64[{unit}]"), return_inverse=True)
+    sums = _sums(groups.ravel(), len(labels), logs)
+    columns = {
+        "period": [str(label) for label in labels],
+        "count": sums["count"].tolist(),
+        "avg_guilt": _json_floats(_ratio(sums["guilt"], sums["guilt_count"]), 2),
+        "avg_regret": _json_floats(_ratio(sums["regret"], sums["regret_count"]), 2),
+        "total_cost": _json_floats(sums["cost"], 2),
+        "total_calories": sums["calories"].astype("int64").tolist(),
+    }
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+def heatmap(logs: LogArrays) -> List[List[int]]:
+    """7x24 log counts, rows Monday..Sunday and columns hour of day (UTC)"""
+    seconds = logs.created_at.astype("int64")
+    weekday = (seconds // 86400 + 3) % 7  # 1970-01-01 was a Thursday
+    hour = seconds % 86400 // 3600
+    return np.bincount(weekday * 24 + hour, minlength=7 * 24).reshape(7, 24).tolist()
+
+def daily_sums(logs: LogArrays, start: date, end: date) -> Dict[str, np.ndarray]:
+    """_sums per calendar day from start to end, including days without logs"""
+    days = (logs.created_at.astype("datetime64[D]") - np.datetime64(start, "D")).astype("int64")
+    return _sums(days, (end - start).days + 1, logs)
+
+def rolling_averages(daily: Dict[str, np.ndarray], start: date, window: int) -> List[Dict[str, Any]]:
+    """Average guilt and regret over each day's trailing `window` days (None when nothing was rated)"""
+    size = len(daily["count"])
+    upper = np.arange(1, size + 1)
+    lower = np.maximum(upper - window, 0)
+    averages = {}
+    for name in ("guilt", "regret"):
+        total = np.concatenate(([0.0], np.cumsum(daily[name])))
+        count = np.concatenate(([0], np.cumsum(daily[f"{name}_count"])))
+        averages[name] = _json_floats(_ratio(total[upper] - total[lower], count[upper] - count[lower]), 2)
+    dates = np.arange(np.datetime64(start, "D"), np.datetime64(start, "D") + size).tolist()
+    return [
+        {"date": day.isoformat(), "avg_guilt": guilt, "avg_regret": regret}
+        for day, guilt, regret in zip(dates, averages["guilt"], averages["regret"])
+    ]
+
+def cost_projection(daily_cost: np.ndarray, basis_days: int = PROJECTION_BASIS_DAYS) -> Dict[str, Any]:
+    """Future spending at the recent daily average and along a linear trend fitted to it"""
+    recent = daily_cost[-basis_days:]
+    if not len(recent):
+        return {"basis_days": 0, "daily_average": 0, "daily_trend": 0, "projections": []}
+    average = float(recent.mean())
+    slope, intercept = np.polyfit(np.arange(len(recent)), recent, 1) if len(recent) > 1 else (0.0, average)
+    projections = []
+    for horizon in PROJECTION_HORIZONS:
+        ahead = np.arange(len(recent), len(recent) + horizon)
+        projections.append({
+            "days": horizon,
+            "at_current_rate": round(average * horizon, 2),
+            "with_trend": round(float(np.clip(intercept + slope * ahead, 0, None).sum()), 2),
+        })
+    return {
+        "basis_days": len(recent),
+        "daily_average": round(average, 2),
+        "daily_trend": round(float(slope), 4),
+        "projections": projections,
+    }
+
+def summarize(logs: LogArrays, start: date, end: date, window: int = 7) -> Dict[str, Any]:
+    """Every long-range view for the logs loaded from start to end"""
+    daily = daily_sums(logs, start, end)
+    return {
+        "total_logs": len(logs),
+        "total_cost": round(float(daily["cost"].sum()), 2),
+        "total_calories": int(daily["calories"].sum()),
+        "monthly": period_trends(logs, "M"),
+        "yearly": period_trends(logs, "Y"),
+        "heatmap": {"weekdays": list(WEEKDAYS), "counts": heatmap(logs)},
+        "rolling": {"window_days": window, "days": rolling_averages(daily, start, window)},
+        "cost_projection": cost_projection(daily["cost"]),
+    }
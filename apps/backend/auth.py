@@ -1,22 +1,48 @@
 import os
 from dotenv import load_dotenv
 load_dotenv()
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from postgres_client import db_client
+from postgres_client import async_db_client
+from cache import TTLCache
 
 # Security configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Authenticated-user cache: users row by id, plus token subject (email) -> id
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+# bcrypt runs on a small dedicated thread pool (it releases the GIL) so hashing never blocks the event loop
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))  # beyond this, reject with 503
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix="bcrypt")
+_password_ops_pending = 0  # only touched on the event loop thread
+
+# Rows are keyed by id so invalidating by id always reaches them; losing an email -> id entry
+# only costs a database lookup
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+_user_ids = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+def invalidate_cached_user(user_id: Optional[int] = None, email: Optional[str] = None):
+    """Drop a user's cached row; call after any write to the users table (pass the old email when it changes)"""
+    if user_id is not None:
+        _user_cache.delete(user_id)
+    if email is not None:
+        _user_ids.delete(email)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -25,6 +51,30 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def _run_password_op(fn, *args):
+    """Run a bcrypt call on the password pool, shedding load once the queue is full"""
+    global _password_ops_pending
+    if _password_ops_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    _password_ops_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, fn, *args)
+    finally:
+        _password_ops_pending -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash without blocking the event loop"""
+    return await _run_password_op(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await _run_password_op(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -53,13 +103,21 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    # Get user from database
-    users = db_client.execute_query(
-        "SELECT * FROM users WHERE email = %s",
-        (email,)
-    )
-    
-    if not users:
-        raise credentials_exception
-    
-    return users[0]
\ No newline at end of file
+    # Get user from cache, falling back to the database
+    user_id = _user_ids.get(email)
+    user = _user_cache.get(user_id) if user_id is not None else None
+    if user is None or user["email"] != email:
+        users = await async_db_client.execute_query(
+            "SELECT * FROM users WHERE email = %s",
+            (email,)
+        )
+
+        if not users:
+            raise credentials_exception
+
+        user = users[0]
+        _user_ids.set(email, user["id"])
+        _user_cache.set(user["id"], user)
+
+    # Copy so handlers can't mutate the cached row
+    return dict(user)
\ No newline at end of file
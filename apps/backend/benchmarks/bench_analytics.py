@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Time the long-range analytics in analytics.py on a synthetic heavy user
+(several years of logs), comparing the vectorized summarize() with the same
+monthly, yearly, heatmap, rolling and projection views computed by looping
+over the logs in Python. No database is needed.
+
+Usage:
+    python benchmarks/bench_analytics.py [--years 5] [--logs-per-day 20] [--window 7]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import LogArrays, summarize, PROJECTION_BASIS_DAYS
+
+def synthetic_logs(years: int, logs_per_day: int, rng: random.Random):
+    end = datetime(2026, 1, 1)
+    start = end - timedelta(days=365 * years)
+    span = (end - start).total_seconds()
+    rows = []
+    for _ in range(365 * years * logs_per_day):
+        created_at = start + timedelta(seconds=rng.random() * span)
+        guilt = rng.randint(1, 10) if rng.random() > 0.05 else None
+        rows.append((created_at, guilt, rng.randint(1, 10), round(rng.uniform(2, 25), 2), rng.randint(150, 1200)))
+    rows.sort()
+    return rows, start.date(), (end - timedelta(seconds=1)).date()
+
+def naive_summary(rows, start, end, window):
+    """Per-row Python loops producing the same views as analytics.summarize"""
+    def bucket():
+        return {"count": 0, "guilt": 0, "guilt_count": 0, "regret": 0, "regret_count": 0, "cost": 0.0, "calories": 0}
+
+    months, years, days = {}, {}, {}
+    heatmap = [[0] * 24 for _ in range(7)]
+    for created_at, guilt, regret, cost, calories in rows:
+        for groups, key in ((months, created_at.strftime("%Y-%m")), (years, str(created_at.year)), (days, created_at.date())):
+            group = groups.setdefault(key, bucket())
+            group["count"] += 1
+            group["cost"] += cost or 0
+            group["calories"] += calories or 0
+            if guilt is not None:
+                group["guilt"] += guilt
+                group["guilt_count"] += 1
+            if regret is not None:
+                group["regret"] += regret
+                group["regret_count"] += 1
+        heatmap[created_at.weekday()][created_at.hour] += 1
+
+    def trends(groups):
+        return [
+            {
+                "period": key,
+                "count": group["count"],
+                "avg_guilt": round(group["guilt"] / group["guilt_count"], 2) if group["guilt_count"] else None,
+                "avg_regret": round(group["regret"] / group["regret_count"], 2) if group["regret_count"] else None,
+                "total_cost": round(group["cost"], 2),
+                "total_calories": group["calories"],
+            }
+            for key, group in sorted(groups.items())
+        ]
+
+    calendar = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    rolling = []
+    for i, day in enumerate(calendar):
+        trailing = [days[d] for d in calendar[max(0, i - window + 1):i + 1] if d in days]
+        guilt_count = sum(group["guilt_count"] for group in trailing)
+        regret_count = sum(group["regret_count"] for group in trailing)
+        rolling.append({
+            "date": day.isoformat(),
+            "avg_guilt": round(sum(group["guilt"] for group in trailing) / guilt_count, 2) if guilt_count else None,
+            "avg_regret": round(sum(group["regret"] for group in trailing) / regret_count, 2) if regret_count else None,
+        })
+    recent = [days[d]["cost"] if d in days else 0.0 for d in calendar[-PROJECTION_BASIS_DAYS:]]
+    return {
+        "monthly": trends(months),
+        "yearly": trends(years),
+        "heatmap": heatmap,
+        "rolling": rolling,
+        "daily_average": round(sum(recent) / len(recent), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--logs-per-day", type=int, default=20)
+    parser.add_argument("--window", type=int, default=7, help="rolling average window in days")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows, start, end = synthetic_logs(args.years, args.logs_per_day, random.Random(42))
+    columns = list(zip(*rows))
+    logs = LogArrays(
+        [int((created_at - datetime(1970, 1, 1)).total_seconds()) for created_at in columns[0]],
+        *columns[1:]
+    )
+    print(f"{len(rows)} logs from {start} to {end}")
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        vectorized = summarize(logs, start, end, args.window)
+        timings.append((time.perf_counter() - started) * 1000)
+    started = time.perf_counter()
+    naive = naive_summary(rows, start, end, args.window)
+    naive_ms = (time.perf_counter() - started) * 1000
+
+    matches = (
+        vectorized["monthly"] == naive["monthly"]
+        and vectorized["yearly"] == naive["yearly"]
+        and vectorized["heatmap"]["counts"] == naive["heatmap"]
+        and vectorized["rolling"]["days"] == naive["rolling"]
+        and vectorized["cost_projection"]["daily_average"] == naive["daily_average"]
+    )
+    print(f"vectorized: {min(timings):.1f}ms (best of {args.repeat})")
+    print(f"naive:      {naive_ms:.1f}ms")
+    print(f"results match: {matches}")
+
+if __name__ == "__main__":
+    main()
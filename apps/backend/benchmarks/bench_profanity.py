@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Time profanity checks on 500-character posts against a large wordlist,
+comparing the compiled matcher in profanity.py with the old
+any(word in text) scan. A synthetic wordlist is generated unless --wordlist
+is given; no database is needed.
+
+Usage:
+    python benchmarks/bench_profanity.py [--terms 10000] [--posts 2000] [--wordlist path]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profanity import ProfanityMatcher, load_wordlist, normalize
+
+def synthetic_terms(count: int, rng: random.Random):
+    terms = set()
+    while len(terms) < count:
+        terms.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))))
+    return sorted(terms)
+
+def synthetic_posts(count: int, length: int, terms, rng: random.Random, dirty_ratio: float):
+    vocabulary = ["i", "ate", "pizza", "again", "today", "feeling", "guilty", "but", "tomorrow", "is", "new", "day", "streak", "burger", "craving"]
+    posts = []
+    for _ in range(count):
+        words = []
+        while sum(len(w) + 1 for w in words) < length:
+            words.append(rng.choice(vocabulary))
+        if rng.random() < dirty_ratio:
+            words[rng.randrange(len(words))] = rng.choice(terms)
+        posts.append(" ".join(words)[:length])
+    return posts
+
+def naive_is_profane(text, terms):
+    lowered = text.lower()
+    return any(term in lowered for term in terms)
+
+def time_per_post(check, posts):
+    start = time.perf_counter()
+    hits = sum(1 for post in posts if check(post))
+    return (time.perf_counter() - start) * 1000 / len(posts), hits
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", type=int, default=10000, help="synthetic wordlist size")
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--length", type=int, default=500, help="characters per post")
+    parser.add_argument("--dirty-ratio", type=float, default=0.1, help="fraction of posts containing a listed term")
+    parser.add_argument("--wordlist", help="use this wordlist instead of synthetic terms")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    terms = load_wordlist(args.wordlist) if args.wordlist else synthetic_terms(args.terms, rng)
+    plain_terms = [normalize(term.rstrip("*")) for term in terms]
+    posts = synthetic_posts(args.posts, args.length, plain_terms, rng, args.dirty_ratio)
+
+    start = time.perf_counter()
+    matcher = ProfanityMatcher(terms)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{matcher.size} terms, {len(posts)} posts of {args.length} chars; matcher built in {build_ms:.1f}ms")
+
+    compiled_ms, compiled_hits = time_per_post(matcher.contains, posts)
+    naive_ms, naive_hits = time_per_post(lambda post: naive_is_profane(post, plain_terms), posts)
+    print(f"compiled: {compiled_ms:.4f}ms/post ({compiled_hits} flagged)")
+    print(f"naive:    {naive_ms:.4f}ms/post ({naive_hits} flagged, substring matches included)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Compare query plans for the hot query shapes with and without the indexes
+created by migrations 004, 005 and 006.
+
+Everything runs inside a single transaction that is rolled back at the end,
+so the optional synthetic seed data and the temporarily dropped indexes never
+persist. Apply migrations first (python migrations.py).
+
+Usage:
+    python benchmarks/bench_query_plans.py [--seed-users 200] [--logs-per-user 500]
+"""
+import argparse
+import os
+import sys
+import uuid
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postgres_client import db_client, Transaction
+from migrations import HOT_QUERY_INDEXES
+
+HOT_QUERIES = [
+    ("logs page", "SELECT * FROM junk_food_logs WHERE user_id = %(user_id)s ORDER BY created_at DESC, id DESC LIMIT 21"),
+    ("logs page (cursor)", "SELECT * FROM junk_food_logs WHERE user_id = %(user_id)s AND (created_at, id) < (NOW() - INTERVAL '180 days', 0) ORDER BY created_at DESC, id DESC LIMIT 21"),
+    ("weekly analytics", "SELECT * FROM junk_food_logs WHERE user_id = %(user_id)s AND created_at >= NOW() - INTERVAL '7 days'"),
+    ("notifications", "SELECT * FROM notifications WHERE user_id = %(user_id)s ORDER BY created_at DESC LIMIT 50"),
+    ("notifications resume", "SELECT * FROM notifications WHERE user_id = %(user_id)s AND id > 0 ORDER BY id LIMIT 100"),
+    ("unread count", "SELECT COUNT(*) FROM notifications WHERE user_id = %(user_id)s AND read = FALSE"),
+    ("post replies", "SELECT * FROM community_post_replies WHERE post_id = %(post_id)s ORDER BY created_at ASC, id ASC"),
+    ("community feed", "SELECT * FROM community_posts_with_reply_count WHERE is_anonymous = TRUE ORDER BY created_at DESC, id DESC LIMIT 21"),
+    ("my posts", "SELECT * FROM community_posts WHERE user_id = %(user_id)s ORDER BY created_at DESC, id DESC"),
+]
+
+def seed(tx: Transaction, users: int, logs_per_user: int):
+    """Insert synthetic users, logs, posts, replies and notifications"""
+    tag = uuid.uuid4().hex[:8]
+    user_ids = [row["id"] for row in tx.execute_query(
+        """
+        INSERT INTO users (email, username, password_hash)
+        SELECT 'bench_' || g || '_' || %s || '@example.com', 'bench' || g, 'x'
+        FROM generate_series(1, %s) g
+        RETURNING id
+        """,
+        (tag, users)
+    )]
+    tx.execute_update(
+        """
+        INSERT INTO junk_food_logs (user_id, food_type, guilt_rating, regret_rating, estimated_cost, estimated_calories, created_at)
+        SELECT u.id, 'pizza', 1 + (random() * 9)::int, 1 + (random() * 9)::int, random() * 20, 300, NOW() - random() * INTERVAL '365 days'
+        FROM unnest(%s::int[]) AS u(id), generate_series(1, %s)
+        """,
+        (user_ids, logs_per_user)
+    )
+    tx.execute_update(
+        """
+        INSERT INTO community_posts (user_id, content, is_anonymous, created_at)
+        SELECT u.id, 'bench post', random() < 0.8, NOW() - random() * INTERVAL '365 days'
+        FROM unnest(%s::int[]) AS u(id), generate_series(1, 20)
+        """,
+        (user_ids,)
+    )
+    tx.execute_update(
+        """
+        INSERT INTO community_post_replies (post_id, user_id, content, created_at)
+        SELECT p.id, p.user_id, 'bench reply', p.created_at + random() * INTERVAL '1 day'
+        FROM community_posts p, generate_series(1, 5)
+        WHERE p.content = 'bench post'
+        """
+    )
+    tx.execute_update(
+        """
+        INSERT INTO notifications (user_id, type, message, created_at)
+        SELECT u.id, 'like', 'Your post received a like!', NOW() - random() * INTERVAL '365 days'
+        FROM unnest(%s::int[]) AS u(id), generate_series(1, 100)
+        """,
+        (user_ids,)
+    )
+    for table in ("users", "junk_food_logs", "community_posts", "community_post_replies", "notifications"):
+        tx.execute_update(f"ANALYZE {table}")
+
+def _node_types(plan, found=None):
+    found = [] if found is None else found
+    label = plan["Node Type"]
+    if plan.get("Index Name"):
+        label += f" ({plan['Index Name']})"
+    found.append(label)
+    for child in plan.get("Plans", []):
+        _node_types(child, found)
+    return found
+
+def explain_all(tx: Transaction, params: dict):
+    results = {}
+    for label, query in HOT_QUERIES:
+        tx.execute_query(query, params)  # warm the cache so both runs compare plans, not I/O
+        plan = tx.execute_query(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", params)[0]["QUERY PLAN"][0]
+        results[label] = (plan["Execution Time"], " > ".join(_node_types(plan["Plan"])))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-users", type=int, default=0, help="synthetic users to insert (rolled back afterwards)")
+    parser.add_argument("--logs-per-user", type=int, default=500)
+    args = parser.parse_args()
+
+    conn = db_client.get_connection()
+    try:
+        tx = Transaction(conn)
+        if args.seed_users:
+            print(f"Seeding {args.seed_users} users x {args.logs_per_user} logs...")
+            seed(tx, args.seed_users, args.logs_per_user)
+
+        busiest = tx.execute_query("SELECT user_id FROM junk_food_logs GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1")
+        post = tx.execute_query("SELECT post_id FROM community_post_replies GROUP BY post_id ORDER BY COUNT(*) DESC LIMIT 1")
+        params = {
+            "user_id": busiest[0]["user_id"] if busiest else 0,
+            "post_id": post[0]["post_id"] if post else 0,
+        }
+
+        after = explain_all(tx, params)
+        for name, _ in HOT_QUERY_INDEXES:
+            tx.execute_update(f"DROP INDEX IF EXISTS {name}")
+        before = explain_all(tx, params)
+
+        for label, _ in HOT_QUERIES:
+            before_ms, before_plan = before[label]
+            after_ms, after_plan = after[label]
+            print(f"\n{label}: {before_ms:.2f}ms -> {after_ms:.2f}ms")
+            print(f"  before: {before_plan}")
+            print(f"  after:  {after_plan}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -168,6 +168,7 @@ class LocalResult:
         self.data = data
 
 # Database schema creation
+# This is the baseline schema (migration 1); later schema changes live in migrations.py
 DATABASE_SCHEMA = {
     "users": """
         CREATE TABLE IF NOT EXISTS users (
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from cache import TTLCache
+from redis_client import get_redis, redis_stats
+
+load_dotenv()
+
+# Community feed cache. Pages are cached as lists of post ids under a generation number, and
+# the post rows themselves are cached per id, so a like only patches one row and a new or
+# deleted post only has to bump the generation to retire every cached page at once.
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "30"))
+FEED_CACHE_SIZE = int(os.getenv("FEED_CACHE_SIZE", "5000"))
+
+FEED_POST_FIELDS = ("id", "content", "photo_url", "likes_count", "created_at", "replies_count")
+
+class LocalCacheBackend:
+    """In-process backend: LRU + TTL entries and plain counters"""
+
+    def __init__(self, maxsize: int = FEED_CACHE_SIZE, ttl: float = FEED_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        return [self._cache.get(key) for key in keys]
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: float):
+        for key, value in mapping.items():
+            self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._cache.delete(key)
+
+    async def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "local", **self._cache.stats()}
+
+class RedisCacheBackend:
+    """Redis backend; values are stored as JSON so every worker sees the same entries"""
+
+    def __init__(self, redis):
+        self._redis = redis
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        values = await self._redis.mget(keys)
+        return [json.loads(value) if value is not None else None for value in values]
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: float):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, json.dumps(value), px=int(ttl * 1000))
+            await pipe.execute()
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._redis.delete(*keys)
+
+    async def incr(self, key: str) -> int:
+        return await self._redis.incr(key)
+
+    async def get_counter(self, key: str) -> int:
+        value = await self._redis.get(key)
+        return int(value) if value is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return redis_stats()
+
+def create_cache_backend():
+    """Redis when REDIS_URL is configured and the client is installed, otherwise in-process"""
+    redis = get_redis()
+    return RedisCacheBackend(redis) if redis is not None else LocalCacheBackend()
+
+class FeedCache:
+    """Cached community feed pages (post ids) and post rows, independent of the viewing user"""
+
+    def __init__(self, backend=None, ttl: float = FEED_CACHE_TTL):
+        self.backend = backend or create_cache_backend()
+        self.ttl = ttl
+        self.page_hits = 0
+        self.page_misses = 0
+
+    @staticmethod
+    def _post_key(post_id: int) -> str:
+        return f"feed:post:{post_id}"
+
+    async def _page_key(self, limit: int, offset: int, cursor: Optional[str]) -> str:
+        generation = await self.backend.get_counter("feed:generation")
+        return f"feed:page:{generation}:{limit}:{offset}:{cursor or ''}"
+
+    async def get_page(self, limit: int, offset: int, cursor: Optional[str], load_posts) -> Tuple[str, Optional[Tuple[List[Dict[str, Any]], Optional[str]]]]:
+        """Return (page_key, (posts, next_cursor)) for a cached page, or (page_key, None) on a miss.
+
+        On a miss, pass page_key to store_page: it names the generation current before the
+        posts were queried, so a page loaded across a create/delete is never stored as fresh.
+        Post rows that expired or were evicted are reloaded with load_posts(ids) in one query.
+        """
+        page_key = await self._page_key(limit, offset, cursor)
+        page = (await self.backend.get_many([page_key]))[0]
+        if page is None:
+            self.page_misses += 1
+            return page_key, None
+        self.page_hits += 1
+        ids = page["ids"]
+        cached = await self.backend.get_many([self._post_key(post_id) for post_id in ids])
+        posts = {post["id"]: post for post in cached if post is not None}
+        missing = [post_id for post_id in ids if post_id not in posts]
+        if missing:
+            loaded = await self.store_posts(await load_posts(missing))
+            posts.update((post["id"], post) for post in loaded)
+        # Posts deleted since the page was cached are simply skipped
+        return page_key, ([posts[post_id] for post_id in ids if post_id in posts], page["next_cursor"])
+
+    async def store_posts(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        posts = [serialize_post(row) for row in rows]
+        await self.backend.set_many({self._post_key(post["id"]): post for post in posts}, self.ttl)
+        return posts
+
+    async def store_page(self, page_key: str, rows: List[Dict[str, Any]], next_cursor: Optional[str]) -> List[Dict[str, Any]]:
+        posts = await self.store_posts(rows)
+        await self.backend.set_many({page_key: {"ids": [post["id"] for post in posts], "next_cursor": next_cursor}}, self.ttl)
+        return posts
+
+    async def patch_post(self, post_id: int, **fields):
+        """Update fields of a cached post row in place; no-op if it isn't cached"""
+        key = self._post_key(post_id)
+        post = (await self.backend.get_many([key]))[0]
+        if post is not None:
+            post = {**post, **fields}
+            await self.backend.set_many({key: post}, self.ttl)
+
+    async def invalidate_post(self, post_id: int):
+        await self.backend.delete(self._post_key(post_id))
+
+    async def invalidate_pages(self):
+        """Retire every cached page, e.g. after a post is created or deleted"""
+        await self.backend.incr("feed:generation")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"page_hits": self.page_hits, "page_misses": self.page_misses, **self.backend.stats()}
+
+def serialize_post(row: Dict[str, Any]) -> Dict[str, Any]:
+    """The user-independent part of a feed entry, JSON-safe so any backend can hold it"""
+    post = {field: row.get(field) for field in FEED_POST_FIELDS}
+    post["likes_count"] = post["likes_count"] or 0
+    post["replies_count"] = post["replies_count"] or 0
+    if hasattr(post["created_at"], "isoformat"):
+        post["created_at"] = post["created_at"].isoformat()
+    return post
+
+# Global feed cache
+feed_cache = FeedCache()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Write-behind aggregation of community_posts.likes_count.
+
+Like/unlike only insert or delete the community_post_likes row and add a +1/-1
+delta here; the deltas are summed per post and written every
+LIKE_FLUSH_INTERVAL_MS in one batched UPDATE, so a viral post takes one counter
+write per interval instead of one per tap. A failed UPDATE never commits, so
+its deltas are simply retried with the next flush.
+
+Deltas still in memory when a worker dies are lost. On startup the posts liked
+in the last LIKE_REPLAY_WINDOW seconds are recounted from community_post_likes
+(the source of truth); this script recounts every post.
+
+Usage:
+    python like_counter.py --reconcile
+"""
+import argparse
+import asyncio
+import os
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+
+from postgres_client import async_db_client, AsyncPostgreSQLClient
+from feed_cache import feed_cache
+
+load_dotenv()
+
+LIKE_FLUSH_INTERVAL_MS = int(os.getenv("LIKE_FLUSH_INTERVAL_MS", "250"))
+# Posts liked this many seconds before startup are recounted to replay a crashed worker's deltas (0 disables)
+LIKE_REPLAY_WINDOW = float(os.getenv("LIKE_REPLAY_WINDOW", "600"))
+
+class LikeCounter:
+    """Per-process buffer of unflushed likes_count deltas"""
+
+    def __init__(self, client: AsyncPostgreSQLClient = async_db_client, interval_ms: int = LIKE_FLUSH_INTERVAL_MS):
+        self.client = client
+        self.interval = interval_ms / 1000
+        self._pending: Dict[int, int] = {}
+        self._inflight: Dict[int, int] = {}  # being written; still unflushed as far as readers are concerned
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self.flushes = 0
+        self.flushed_posts = 0
+
+    def add(self, post_id: int, delta: int):
+        self._pending[post_id] = self._pending.get(post_id, 0) + delta
+
+    def pending(self, post_id: int) -> int:
+        return self._pending.get(post_id, 0) + self._inflight.get(post_id, 0)
+
+    def merge(self, post: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of a post row with the unflushed delta applied to likes_count"""
+        delta = self.pending(post["id"])
+        if not delta:
+            return post
+        return {**post, "likes_count": max((post.get("likes_count") or 0) + delta, 0)}
+
+    async def flush(self) -> int:
+        """Write every pending delta in one statement and return the number of posts updated"""
+        async with self._flush_lock:
+            pending = {post_id: delta for post_id, delta in self._pending.items() if delta}
+            # Swap before awaiting so taps during the write accumulate into a fresh buffer
+            self._pending = {}
+            if not pending:
+                return 0
+            self._inflight = pending
+            try:
+                rows = await self.client.execute_many(
+                    """
+                    UPDATE community_posts AS p
+                    SET likes_count = p.likes_count + v.delta
+                    FROM (VALUES %s) AS v(id, delta)
+                    WHERE p.id = v.id
+                    RETURNING p.id, p.likes_count
+                    """,
+                    sorted(pending.items()),  # fixed lock order, so concurrent workers can't deadlock
+                    template="(%s::int, %s::int)"
+                )
+            except Exception as e:
+                # Nothing was committed, so the same deltas are safe to apply with the next flush
+                print(f"Failed to flush like counts, will retry: {e}")
+                for post_id, delta in pending.items():
+                    self.add(post_id, delta)
+                self._inflight = {}
+                return 0
+            try:
+                for row in rows:
+                    # Cached rows hold the stored count; reads add whatever is still pending
+                    await feed_cache.patch_post(row["id"], likes_count=row["likes_count"])
+            except Exception as e:
+                print(f"Failed to update cached like counts: {e}")
+            finally:
+                self._inflight = {}
+            self.flushes += 1
+            self.flushed_posts += len(rows)
+            return len(rows)
+
+    async def replay(self, window: float = LIKE_REPLAY_WINDOW) -> int:
+        """Recount the posts liked in the last `window` seconds, covering deltas a crashed worker never wrote"""
+        if window <= 0:
+            return 0
+        return await self.client.execute_update(
+            """
+            UPDATE community_posts AS p
+            SET likes_count = c.likes
+            FROM (
+                SELECT post_id, COUNT(*) AS likes
+                FROM community_post_likes
+                WHERE post_id IN (
+                    SELECT post_id FROM community_post_likes
+                    WHERE created_at > CURRENT_TIMESTAMP - make_interval(secs => %s)
+                )
+                GROUP BY post_id
+            ) AS c
+            WHERE p.id = c.post_id AND p.likes_count IS DISTINCT FROM c.likes
+            """,
+            (window,)
+        )
+
+    async def reconcile(self) -> int:
+        """Reset likes_count to the number of like rows wherever they disagree (maintenance, see --reconcile)"""
+        await self.flush()
+        return await self.client.execute_update(
+            """
+            UPDATE community_posts AS p
+            SET likes_count = c.likes
+            FROM (
+                SELECT p2.id, COUNT(l.id) AS likes
+                FROM community_posts p2
+                LEFT JOIN community_post_likes l ON l.post_id = p2.id
+                GROUP BY p2.id
+            ) AS c
+            WHERE p.id = c.id AND p.likes_count IS DISTINCT FROM c.likes
+            """
+        )
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            # Shielded so stop() never cancels a write halfway; its own flush waits for this one
+            await asyncio.shield(self.flush())
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": self.interval * 1000,
+            "pending_posts": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_posts": self.flushed_posts,
+        }
+
+# Global like counter
+like_counter = LikeCounter()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reconcile", action="store_true", required=True)
+    parser.parse_args()
+
+    async def reconcile():
+        try:
+            return await like_counter.reconcile()
+        finally:
+            async_db_client.close()
+
+    print(f"Reconciled likes_count for {asyncio.run(reconcile())} post(s)")
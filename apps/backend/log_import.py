@@ -0,0 +1,295 @@
+import codecs
+import csv
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from dotenv import load_dotenv
+
+from postgres_client import async_db_client, AsyncPostgreSQLClient
+from rollup import rollup_delta_sql, totals_delta_sql
+from ai_coach import estimate_calories_many
+from cache import TTLCache
+
+load_dotenv()
+
+# Bulk import of historical logs from CSV or NDJSON. Rows are validated as the upload streams in and
+# written LOG_IMPORT_BATCH_SIZE at a time with one multi-row INSERT, which also updates the daily
+# rollup and the user's totals; the streak is recomputed once at the end. No photo, AI motivation
+# or achievement processing happens per row.
+LOG_IMPORT_BATCH_SIZE = int(os.getenv("LOG_IMPORT_BATCH_SIZE", "1000"))
+LOG_IMPORT_MAX_ROWS = int(os.getenv("LOG_IMPORT_MAX_ROWS", "50000"))
+# Distinct food descriptions per import estimated by the AI coach; the rest use the keyword estimate
+LOG_IMPORT_AI_ESTIMATES = int(os.getenv("LOG_IMPORT_AI_ESTIMATES", "50"))
+# Longest CSV record / NDJSON line, so a missing newline or quote can't buffer the whole upload
+LOG_IMPORT_MAX_LINE_LENGTH = 64 * 1024
+LOG_IMPORT_MAX_ERRORS = 100  # errors reported back; later ones are only counted
+
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+# Optional columns: estimated_cost, estimated_calories (estimated when missing), location
+REQUIRED_FIELDS = ("created_at", "food_type", "guilt_rating", "regret_rating")
+
+# Rows already logged with the same timestamp and food are skipped, so a failed import can be re-run;
+# repeats of a row within one batch are inserted once
+_INSERT = f"""
+    WITH inserted AS (
+        INSERT INTO junk_food_logs (user_id, created_at, food_type, guilt_rating, regret_rating, estimated_cost, estimated_calories, location)
+        SELECT DISTINCT ON (v.user_id, v.created_at, v.food_type) v.*
+        FROM (VALUES %s) AS v(user_id, created_at, food_type, guilt_rating, regret_rating, estimated_cost, estimated_calories, location)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM junk_food_logs l
+            WHERE l.user_id = v.user_id AND l.created_at = v.created_at AND l.food_type = v.food_type
+        )
+        RETURNING *
+    ), rolled_up AS ({rollup_delta_sql("inserted")}
+    ), totals AS ({totals_delta_sql("inserted")}
+    )
+    SELECT COUNT(*) AS imported FROM inserted
+"""
+_TEMPLATE = "(%s::int, %s::timestamp, %s::varchar, %s::int, %s::int, %s::numeric, %s::int, %s::text)"
+
+# Imported days can only shorten the current clean streak (the latest log may now be more recent)
+# and can only lengthen the best one (the longest gap between logged days)
+_UPDATE_STREAK = """
+    WITH days AS (
+        SELECT DISTINCT created_at::date AS day FROM junk_food_logs WHERE user_id = %s
+    ), clean AS (
+        SELECT MAX(day) AS last_day, MAX(day - previous - 1) AS longest_gap
+        FROM (SELECT day, LAG(day) OVER (ORDER BY day) AS previous FROM days) AS d
+    )
+    UPDATE users SET
+        streak_count = LEAST(users.streak_count, GREATEST((now() AT TIME ZONE 'utc')::date - clean.last_day, 0)),
+        best_streak = GREATEST(users.best_streak, COALESCE(clean.longest_gap, 0))
+    FROM clean
+    WHERE users.id = %s AND clean.last_day IS NOT NULL
+    RETURNING users.streak_count, users.best_streak
+"""
+
+class ImportFormatError(ValueError):
+    """The upload as a whole can't be read (unknown format, missing CSV columns, runaway line)"""
+
+# Latest progress per user, for GET /api/logs/import/status (this process only)
+log_import_progress = TTLCache(maxsize=10000, ttl=3600)
+
+def import_format(content_type: Optional[str], format: Optional[str] = None) -> str:
+    if format:
+        if format not in ("csv", "ndjson"):
+            raise ImportFormatError("format must be csv or ndjson")
+        return format
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in IMPORT_FORMATS:
+        raise ImportFormatError("Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson")
+    return IMPORT_FORMATS[media_type]
+
+def is_import_running(user_id: int) -> bool:
+    progress = log_import_progress.get(user_id)
+    return progress is not None and progress["status"] == "running"
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream and split it into lines without holding more than one line"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+        if len(pending) > LOG_IMPORT_MAX_LINE_LENGTH:
+            raise ImportFormatError(f"Line longer than {LOG_IMPORT_MAX_LINE_LENGTH} characters")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+async def _records(lines: AsyncIterator[str], format: str) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], str]]]:
+    """Yield (row number, fields) for each data row, or (row number, error message) for a malformed one"""
+    header: Optional[List[str]] = None
+    record = ""
+    row_number = 0
+    async for line in lines:
+        if format == "ndjson":
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                fields = json.loads(line)
+            except ValueError:
+                yield row_number, "Invalid JSON"
+                continue
+            yield row_number, fields if isinstance(fields, dict) else "Expected a JSON object"
+            continue
+
+        # A quoted CSV field may contain newlines: keep joining lines until the quotes balance
+        record = record + "\n" + line if record else line
+        if record.count('"') % 2:
+            if len(record) > LOG_IMPORT_MAX_LINE_LENGTH:
+                raise ImportFormatError(f"CSV record longer than {LOG_IMPORT_MAX_LINE_LENGTH} characters")
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            missing = [name for name in REQUIRED_FIELDS if name not in header]
+            if missing:
+                raise ImportFormatError(f"CSV header is missing {', '.join(missing)}")
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row_number, dict(zip(header, values))
+    if record:
+        row_number += 1
+        yield row_number, "Unterminated quoted field"
+
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def _number(fields: Dict[str, Any], name: str, kind, minimum, maximum):
+    value = fields.get(name)
+    if isinstance(value, bool) or (kind is int and isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{name} must be a{'n integer' if kind is int else ' number'}")
+    try:
+        number = kind(value.strip() if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a{'n integer' if kind is int else ' number'}")
+    if number != number or not minimum <= number <= maximum:  # number != number catches NaN
+        raise ValueError(f"{name} must be between {minimum} and {maximum}")
+    return number
+
+def parse_row(user_id: int, fields: Dict[str, Any], now: datetime) -> tuple:
+    """Validate one imported row and return it as an _INSERT tuple (calories None when not given)"""
+    missing = [name for name in REQUIRED_FIELDS if _blank(fields.get(name))]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+
+    try:
+        created_at = datetime.fromisoformat(str(fields["created_at"]).strip())
+    except ValueError:
+        raise ValueError("created_at must be an ISO 8601 date or timestamp")
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if created_at > now:
+        raise ValueError("created_at is in the future")
+
+    food_type = str(fields["food_type"]).strip()
+    if len(food_type) > 255:
+        raise ValueError("food_type is longer than 255 characters")
+
+    guilt_rating = _number(fields, "guilt_rating", int, 1, 10)
+    regret_rating = _number(fields, "regret_rating", int, 1, 10)
+    estimated_cost = 0 if _blank(fields.get("estimated_cost")) else _number(fields, "estimated_cost", float, 0, 99999999.99)
+    estimated_calories = None if _blank(fields.get("estimated_calories")) else _number(fields, "estimated_calories", int, 0, 100000)
+    location = None if _blank(fields.get("location")) else str(fields["location"]).strip()
+
+    return (user_id, created_at, food_type, guilt_rating, regret_rating, estimated_cost, estimated_calories, location)
+
+class LogImport:
+    """One user's import: validates rows as they arrive and writes them a batch at a time"""
+
+    def __init__(self, user_id: int, client: AsyncPostgreSQLClient = async_db_client,
+                 batch_size: int = LOG_IMPORT_BATCH_SIZE, max_rows: int = LOG_IMPORT_MAX_ROWS):
+        self.user_id = user_id
+        self.client = client
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.started = time.monotonic()
+        self.status = "running"
+        self.rows_read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.truncated = False
+        self.batches = 0
+        self.calories_estimated = 0
+        self.ai_estimates_left = LOG_IMPORT_AI_ESTIMATES
+        self.streak: Optional[Dict[str, int]] = None
+        self._calories: Dict[str, int] = {}  # estimates made earlier in this import
+        self._batch: List[tuple] = []
+        self._publish()
+
+    def progress(self) -> Dict[str, Any]:
+        progress = {
+            "status": self.status,
+            "rows_read": self.rows_read,
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": self.errors,
+            "truncated": self.truncated,
+            "batches": self.batches,
+            "calories_estimated": self.calories_estimated,
+            "elapsed_ms": round((time.monotonic() - self.started) * 1000),
+        }
+        if self.streak is not None:
+            progress.update(self.streak)
+        return progress
+
+    def _publish(self):
+        log_import_progress.set(self.user_id, self.progress())
+
+    def _error(self, row_number: int, message: str):
+        self.invalid += 1
+        if len(self.errors) < LOG_IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    async def run(self, chunks: AsyncIterator[bytes], format: str) -> Dict[str, Any]:
+        """Import every row in the stream and return the final progress"""
+        try:
+            now = datetime.utcnow()
+            async for row_number, fields in _records(_lines(chunks), format):
+                if self.rows_read >= self.max_rows:
+                    self.truncated = True
+                    break
+                self.rows_read += 1
+                if isinstance(fields, str):
+                    self._error(row_number, fields)
+                    continue
+                try:
+                    self._batch.append(parse_row(self.user_id, fields, now))
+                except ValueError as e:
+                    self._error(row_number, str(e))
+                    continue
+                if len(self._batch) >= self.batch_size:
+                    await self._flush()
+            await self._flush()
+            if self.imported:
+                # An UPDATE ... RETURNING: execute_insert sends it to the primary and commits it
+                self.streak = await self.client.execute_insert(_UPDATE_STREAK, (self.user_id, self.user_id))
+            self.status = "complete"
+            return self.progress()
+        finally:
+            if self.status == "running":
+                self.status = "failed"  # including a dropped upload, so the user can start another
+            self._publish()
+
+    async def _fill_calories(self, batch: List[tuple]):
+        descriptions = [row[2] for row in batch if row[6] is None and row[2] not in self._calories]
+        if descriptions:
+            estimates, requests = await estimate_calories_many(descriptions, self.ai_estimates_left)
+            self.ai_estimates_left -= requests
+            self._calories.update(estimates)
+        for i, row in enumerate(batch):
+            if row[6] is None:
+                batch[i] = row[:6] + (self._calories[row[2]],) + row[7:]
+                self.calories_estimated += 1
+
+    async def _flush(self):
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        await self._fill_calories(batch)
+        rows = await self.client.execute_many(_INSERT, batch, template=_TEMPLATE, page_size=len(batch))
+        imported = sum(row["imported"] for row in rows)
+        self.imported += imported
+        self.duplicates += len(batch) - imported
+        self.batches += 1
+        self._publish()
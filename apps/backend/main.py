@@ -1,25 +1,38 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Body, Request
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Body, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
 import uvicorn
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List, Optional, Any
 import base64
 from PIL import Image
 import io
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from passlib.hash import bcrypt
-import time
+import asyncio
 import json
 from fastapi import BackgroundTasks
 import subprocess
 import traceback
 
 from models import *
-from postgres_client import db_client
-from auth import get_current_user, create_access_token, verify_password, get_password_hash
+from postgres_client import db_client, async_db_client, DB_ITER_FETCH_SIZE
+from query_stats import query_stats
+from migrations import run_migrations
+from rollup import rollup_delta_sql, totals_delta_sql, backfill
+from analytics import load_logs, summarize
+from log_import import LogImport, ImportFormatError, import_format, is_import_running, log_import_progress
+from pagination import encode_cursor, keyset_condition, keyset_order, keyset_page, NEXT_CURSOR_HEADER
+from feed_cache import feed_cache
+from cache import TTLCache
+from like_counter import like_counter
+from rate_limit import rate_limit, enforce_rate_limit
+from profanity import is_profane
+from notifications import notification_queue, notification_broker, notification_listener, unread_counter, NOTIFICATION_FIELDS
+from auth import get_current_user, create_access_token, verify_password_async, get_password_hash_async, invalidate_cached_user
 from storage import upload_image, delete_image
 from ai_coach import generate_motivation, analyze_patterns, estimate_calories, start_livekit_agent_session
 from database import get_supabase_client
@@ -38,6 +51,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Serve uploaded files
@@ -47,35 +61,45 @@ if not os.path.exists(uploads_dir):
 app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
 
 # Create tables on startup
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
+
 @app.on_event("startup")
 async def startup_event():
     print("FastAPI server starting...")
-
-# Simple in-memory rate limit store: { (user_id, endpoint): [timestamps] }
-rate_limit_store = {}
-RATE_LIMITS = {
-    'post': (5, 60),  # max 5 posts per 60 seconds
-    'reply': (10, 60),
-    'like': (20, 60),
-}
-
-PROFANITY_LIST = ['badword1', 'badword2', 'shit', 'fuck']  # Add more as needed
-
-def is_profane(text):
-    return any(word in text.lower() for word in PROFANITY_LIST)
-
-def check_rate_limit(user_id, action):
-    now = time.time()
-    key = (user_id, action)
-    max_calls, per_seconds = RATE_LIMITS.get(action, (10, 60))
-    timestamps = rate_limit_store.get(key, [])
-    # Remove old timestamps
-    timestamps = [t for t in timestamps if now - t < per_seconds]
-    if len(timestamps) >= max_calls:
-        return False
-    timestamps.append(now)
-    rate_limit_store[key] = timestamps
-    return True
+    if RUN_MIGRATIONS_ON_STARTUP:
+        try:
+            applied = await async_db_client.run(run_migrations, db_client)
+            if applied:
+                print(f"Applied database migrations: {applied}")
+        except Exception as e:
+            print(f"Failed to run database migrations: {e}")
+    try:
+        replayed = await like_counter.replay()
+        if replayed:
+            print(f"Recounted likes_count for {replayed} recently liked post(s)")
+    except Exception as e:
+        print(f"Failed to replay like counts: {e}")
+    like_counter.start()
+    notification_queue.start()
+    notification_listener.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await notification_queue.stop()
+    await notification_listener.stop()
+    await like_counter.stop()
+    async_db_client.close()
+
+async def stream_json_array(rows, transform=None):
+    """Serialize an async row iterator as a JSON array without materializing it"""
+    yield "["
+    first = True
+    async for row in rows:
+        if transform is not None:
+            row = transform(row)
+        yield ("" if first else ",") + json.dumps(jsonable_encoder(row))
+        first = False
+    yield "]"
 
 def compose_video_from_images(image_paths, output_path, duration=5):
     """
@@ -274,7 +298,7 @@ async def health_check():
 async def register(user_data: UserCreate):
     try:
         # Check if user already exists
-        existing_users = db_client.execute_query(
+        existing_users = await async_db_client.execute_query(
             "SELECT * FROM users WHERE email = %s",
             (user_data.email,)
         )
@@ -282,8 +306,8 @@ async def register(user_data: UserCreate):
             raise HTTPException(status_code=400, detail="Email already registered")
         
         # Create user
-        hashed_password = get_password_hash(user_data.password)
-        user = db_client.execute_insert(
+        hashed_password = await get_password_hash_async(user_data.password)
+        user = await async_db_client.execute_insert(
             """
             INSERT INTO users (email, username, password_hash, streak_count, best_streak, total_guilt_score, created_at) 
             VALUES (%s, %s, %s, %s, %s, %s, %s) 
@@ -316,7 +340,7 @@ async def register(user_data: UserCreate):
 async def login(login_data: UserLogin):
     try:
         # Get user by email
-        users = db_client.execute_query(
+        users = await async_db_client.execute_query(
             "SELECT * FROM users WHERE email = %s",
             (login_data.email,)
         )
@@ -329,7 +353,7 @@ async def login(login_data: UserLogin):
         if login_data.email == "demo@junkstop.com" and login_data.password == "password":
             # Demo user authentication
             pass
-        elif not verify_password(login_data.password, user["password_hash"]):
+        elif not await verify_password_async(login_data.password, user["password_hash"]):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Generate access token
@@ -354,7 +378,7 @@ async def login(login_data: UserLogin):
 async def get_user_profile(current_user: dict = Depends(get_current_user)):
     try:
         # Get user stats
-        users = db_client.execute_query(
+        users = await async_db_client.execute_query(
             "SELECT * FROM users WHERE id = %s",
             (current_user["id"],)
         )
@@ -362,15 +386,10 @@ async def get_user_profile(current_user: dict = Depends(get_current_user)):
             raise HTTPException(status_code=404, detail="User not found")
         user = users[0]
         
-        # Get recent logs for calculations
-        logs = db_client.execute_query(
-            "SELECT * FROM junk_food_logs WHERE user_id = %s ORDER BY created_at DESC LIMIT 50",
-            (current_user["id"],)
-        )
-        
-        # Calculate stats
-        total_saved = sum([log.get("estimated_cost", 0) for log in logs])
-        avg_guilt_score = sum([log.get("guilt_rating", 0) for log in logs]) / len(logs) if logs else 0
+        # Lifetime totals are kept on the users row by the log insert/delete statements
+        total_logs = user["total_logs"]
+        total_saved = float(user["total_cost"])
+        avg_guilt_score = user["total_guilt_score"] / total_logs if total_logs else 0
         
         return {
             "id": user["id"],
@@ -380,7 +399,7 @@ async def get_user_profile(current_user: dict = Depends(get_current_user)):
             "best_streak": user["best_streak"],
             "total_saved": total_saved,
             "avg_guilt_score": round(avg_guilt_score, 1),
-            "total_logs": len(logs),
+            "total_logs": total_logs,
             "created_at": user["created_at"].isoformat() if hasattr(user["created_at"], "isoformat") else str(user["created_at"])
         }
     except Exception as e:
@@ -412,24 +431,33 @@ async def create_log(
         estimated_calories = await estimate_calories(food_type)
         print("estimated calories", estimated_calories, "type", type(estimated_calories))
         
-        # Create log entry
-        log = db_client.execute_insert(
-            """
-            INSERT INTO junk_food_logs (user_id, photo_url, food_type, guilt_rating, regret_rating, estimated_cost, estimated_calories, location, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING *
-            """,
-            (current_user["id"], photo_url, food_type, guilt_rating, regret_rating, estimated_cost or 0, estimated_calories, location, datetime.utcnow())
-        )
+        # Create log entry and reset user streak in one transaction / round trip
+        def insert_log(tx):
+            rows = tx.execute_pipeline([
+                (
+                    "UPDATE users SET streak_count = 0 WHERE id = %s",
+                    (current_user["id"],)
+                ),
+                (
+                    """
+                    WITH inserted AS (
+                        INSERT INTO junk_food_logs (user_id, photo_url, food_type, guilt_rating, regret_rating, estimated_cost, estimated_calories, location, created_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        RETURNING *
+                    ), rolled_up AS (""" + rollup_delta_sql("inserted") + """
+                    ), totals AS (""" + totals_delta_sql("inserted") + """)
+                    SELECT * FROM inserted
+                    """,
+                    (current_user["id"], photo_url, food_type, guilt_rating, regret_rating, estimated_cost or 0, estimated_calories, location, datetime.utcnow())
+                ),
+            ])
+            return rows[0] if rows else None
+
+        log = await async_db_client.run_in_transaction(insert_log)
+        invalidate_cached_user(current_user["id"])
         print(log)
         if not log:
             raise HTTPException(status_code=500, detail="Failed to create log")
-        
-        # Reset user streak
-        db_client.execute_update(
-            "UPDATE users SET streak_count = 0 WHERE id = %s",
-            (current_user["id"],)
-        )
         # Generate AI motivation
         motivation = await generate_motivation(current_user["id"], guilt_rating, regret_rating)
         print(motivation)
@@ -445,6 +473,8 @@ async def create_log(
             "estimated_cost": estimated_cost,
             "location": location
         })
+        # Achievements may have awarded XP
+        invalidate_cached_user(current_user["id"])
 
         return {
             "id": log["id"],
@@ -463,15 +493,22 @@ async def create_log(
 
 @app.get("/api/logs", response_model=List[JunkFoodLogResponse])
 async def get_user_logs(
-    limit: int = 20,
-    offset: int = 0,
+    response: Response,
+    limit: int = Query(20, ge=1, le=1000),  # the mobile dashboard asks for 1000
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
+    # Pass the X-Next-Cursor value back as ?cursor= for the next page; offset is only kept for old clients
+    after, after_params = keyset_condition(cursor)
     try:
-        logs = db_client.execute_query(
-            "SELECT * FROM junk_food_logs WHERE user_id = %s ORDER BY created_at DESC LIMIT %s OFFSET %s",
-            (current_user["id"], limit, offset)
+        logs = await async_db_client.execute_query(
+            "SELECT * FROM junk_food_logs WHERE user_id = %s" + after + keyset_order() + " LIMIT %s OFFSET %s",
+            (current_user["id"], *after_params, limit + 1, 0 if cursor else offset)
         )
+        logs, next_cursor = keyset_page(logs, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
         return [
             {
@@ -490,15 +527,69 @@ async def get_user_logs(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/logs/import", dependencies=[Depends(rate_limit("import"))])
+async def import_logs(request: Request, format: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Bulk import past logs from a streamed CSV (with a header row) or NDJSON upload"""
+    try:
+        import_type = import_format(request.headers.get("content-type"), format)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    if is_import_running(current_user["id"]):
+        raise HTTPException(status_code=409, detail="An import is already running")
+    log_import = LogImport(current_user["id"])
+    try:
+        return await log_import.run(request.stream(), import_type)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), **log_import.progress()})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail={"error": str(e), **log_import.progress()})
+    finally:
+        if log_import.imported:
+            invalidate_cached_user(current_user["id"])
+
+@app.get("/api/logs/import/status")
+async def get_import_status(current_user: dict = Depends(get_current_user)):
+    """Progress of the user's running or most recent import, updated after every batch"""
+    progress = log_import_progress.get(current_user["id"])
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No recent import")
+    return progress
+
+@app.delete("/api/logs/{log_id}")
+async def delete_log(log_id: int, current_user: dict = Depends(get_current_user)):
+    try:
+        # Delete the log and take it out of the daily rollup and the user's totals in one statement
+        log = await async_db_client.execute_insert(
+            """
+            WITH deleted AS (
+                DELETE FROM junk_food_logs WHERE id = %s AND user_id = %s RETURNING *
+            ), rolled_up AS (""" + rollup_delta_sql("deleted", sign=-1) + """
+            ), totals AS (""" + totals_delta_sql("deleted", sign=-1) + """)
+            SELECT * FROM deleted
+            """,
+            (log_id, current_user["id"])
+        )
+        if not log:
+            raise HTTPException(status_code=404, detail="Log not found")
+        invalidate_cached_user(current_user["id"])
+        if log["photo_url"]:
+            await delete_image(log["photo_url"])
+        return {"success": True}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Streak management
 @app.post("/api/streak/increment")
 async def increment_streak(current_user: dict = Depends(get_current_user)):
     try:
-        # Get current user data
-        users = db_client.execute_query(
-            "SELECT * FROM users WHERE id = %s",
-            (current_user["id"],)
-        )
+        # Get current user data (read-modify-write, so read from the primary)
+        with async_db_client.use_primary():
+            users = await async_db_client.execute_query(
+                "SELECT * FROM users WHERE id = %s",
+                (current_user["id"],)
+            )
         if not users:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -507,10 +598,11 @@ async def increment_streak(current_user: dict = Depends(get_current_user)):
         best_streak = max(user["best_streak"], new_streak)
         
         # Update user
-        db_client.execute_update(
+        await async_db_client.execute_update(
             "UPDATE users SET streak_count = %s, best_streak = %s WHERE id = %s",
             (new_streak, best_streak, current_user["id"])
         )
+        invalidate_cached_user(current_user["id"])
         
         return {
             "streak_count": new_streak,
@@ -521,68 +613,116 @@ async def increment_streak(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 # Progress analytics
+# Longest range /api/analytics/range and /trends will summarize
+ANALYTICS_MAX_RANGE_DAYS = int(os.getenv("ANALYTICS_MAX_RANGE_DAYS", "3660"))
+
+def analytics_range(days: int, start: Optional[date], end: Optional[date]):
+    """Resolve the days/start/end query parameters to an inclusive (start, end) date range"""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=days - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days + 1 > ANALYTICS_MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {ANALYTICS_MAX_RANGE_DAYS} days")
+    return start, end
+
+async def rollup_summary(user_id: int, start: date, end: date) -> dict:
+    """Totals and per-day breakdown for [start, end] from user_daily_stats, one row per active day"""
+    rows = await async_db_client.execute_query(
+        """
+        SELECT
+            day,
+            GROUPING(day) = 1 AS is_total,
+            SUM(log_count) AS count,
+            SUM(guilt_sum)::float / NULLIF(SUM(log_count), 0) AS avg_guilt,
+            SUM(regret_sum)::float / NULLIF(SUM(log_count), 0) AS avg_regret,
+            COALESCE(SUM(cost_sum), 0)::float AS total_cost,
+            COALESCE(SUM(calories_sum), 0) AS total_calories
+        FROM user_daily_stats
+        WHERE user_id = %s AND day BETWEEN %s AND %s AND log_count > 0
+        GROUP BY GROUPING SETS ((day), ())
+        ORDER BY day
+        """,
+        (user_id, start, end)
+    )
+    totals = next(row for row in rows if row["is_total"])
+    
+    if not totals["count"]:
+        return {
+            "total_logs": 0,
+            "avg_guilt_score": 0,
+            "avg_regret_score": 0,
+            "total_cost": 0,
+            "total_calories": 0,
+            "daily_breakdown": []
+        }
+    
+    daily_breakdown = [
+        {
+            "date": row["day"].isoformat(),
+            "count": row["count"],
+            "avg_guilt": row["avg_guilt"],
+            "avg_regret": row["avg_regret"],
+            "total_cost": row["total_cost"],
+            "total_calories": row["total_calories"]
+        }
+        for row in rows if not row["is_total"]
+    ]
+    
+    return {
+        "total_logs": totals["count"],
+        "avg_guilt_score": round(totals["avg_guilt"], 1),
+        "avg_regret_score": round(totals["avg_regret"], 1),
+        "total_cost": round(totals["total_cost"], 2),
+        "total_calories": totals["total_calories"],
+        "daily_breakdown": daily_breakdown
+    }
+
 @app.get("/api/analytics/weekly")
 async def get_weekly_analytics(current_user: dict = Depends(get_current_user)):
     try:
-        # Get logs from last 7 days
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        logs = db_client.execute_query(
-            "SELECT * FROM junk_food_logs WHERE user_id = %s AND created_at >= %s",
-            (current_user["id"], week_ago)
-        )
-        
-        if not logs:
-            return {
-                "total_logs": 0,
-                "avg_guilt_score": 0,
-                "avg_regret_score": 0,
-                "total_cost": 0,
-                "total_calories": 0,
-                "daily_breakdown": []
-            }
-        
-        # Calculate stats
-        total_logs = len(logs)
-        avg_guilt = sum([log["guilt_rating"] for log in logs]) / total_logs
-        avg_regret = sum([log["regret_rating"] for log in logs]) / total_logs
-        total_cost = sum([log.get("estimated_cost", 0) for log in logs])
-        total_calories = sum([log.get("estimated_calories", 0) for log in logs])
-        
-        # Daily breakdown
-        daily_stats = {}
-        for log in logs:
-            if hasattr(log["created_at"], "isoformat"):
-                date = log["created_at"].isoformat()[:10]
-            else:
-                date = str(log["created_at"])[0:10]
-            if date not in daily_stats:
-                daily_stats[date] = {"count": 0, "guilt": 0, "regret": 0, "cost": 0, "calories": 0}
-            
-            daily_stats[date]["count"] += 1
-            daily_stats[date]["guilt"] += log["guilt_rating"]
-            daily_stats[date]["regret"] += log["regret_rating"]
-            daily_stats[date]["cost"] += log.get("estimated_cost", 0)
-            daily_stats[date]["calories"] += log.get("estimated_calories", 0)
-        
-        daily_breakdown = [
-            {
-                "date": date,
-                "count": stats["count"],
-                "avg_guilt": stats["guilt"] / stats["count"],
-                "avg_regret": stats["regret"] / stats["count"],
-                "total_cost": stats["cost"],
-                "total_calories": stats["calories"]
-            }
-            for date, stats in daily_stats.items()
-        ]
-        
+        # The last 7 calendar days (UTC), today included
+        today = datetime.utcnow().date()
+        return await rollup_summary(current_user["id"], today - timedelta(days=6), today)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/range")
+async def get_range_analytics(
+    days: int = Query(30, ge=1, le=ANALYTICS_MAX_RANGE_DAYS),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Same summary as /weekly for the last `days` days, or for start..end (inclusive) when given"""
+    start, end = analytics_range(days, start, end)
+    try:
         return {
-            "total_logs": total_logs,
-            "avg_guilt_score": round(avg_guilt, 1),
-            "avg_regret_score": round(avg_regret, 1),
-            "total_cost": round(total_cost, 2),
-            "total_calories": total_calories,
-            "daily_breakdown": sorted(daily_breakdown, key=lambda x: x["date"])
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            **await rollup_summary(current_user["id"], start, end)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/trends")
+async def get_trend_analytics(
+    days: int = Query(365, ge=1, le=ANALYTICS_MAX_RANGE_DAYS),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    window: int = 7,
+    current_user: dict = Depends(get_current_user)
+):
+    """Monthly/yearly trends, weekday x hour heatmap, rolling averages and cost projections for a range"""
+    start, end = analytics_range(days, start, end)
+    if not 1 <= window <= 365:
+        raise HTTPException(status_code=400, detail="window must be between 1 and 365 days")
+    try:
+        logs = await load_logs(current_user["id"], start, end)
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            **summarize(logs, start, end, window)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -613,7 +753,7 @@ async def get_ai_user_context(user_id: int):
     """
     try:
         # Get recent logs
-        logs = db_client.execute_query(
+        logs = await async_db_client.execute_query(
             "SELECT * FROM junk_food_logs WHERE user_id = %s ORDER BY created_at DESC LIMIT 10",
             (user_id,)
         )
@@ -670,29 +810,48 @@ async def voice_chat_with_ai(request: AudioChatRequest, current_user: dict = Dep
         raise HTTPException(status_code=500, detail=f"Voice chat failed: {str(e)}")
 
 # Community endpoints
+async def get_liked_post_ids(user_id, post_ids):
+    """Return which of post_ids the user has liked, using one query for the whole page"""
+    if not post_ids:
+        return set()
+    likes = await async_db_client.execute_query(
+        "SELECT post_id FROM community_post_likes WHERE user_id = %s AND post_id = ANY(%s)",
+        (user_id, list(post_ids))
+    )
+    return {like["post_id"] for like in likes}
+
+async def load_feed_posts(post_ids):
+    return await async_db_client.execute_query(
+        "SELECT * FROM community_posts_with_reply_count WHERE id = ANY(%s)",
+        (list(post_ids),)
+    )
+
 @app.get("/api/community/posts")
-async def get_community_posts(limit: int = 20, offset: int = 0, current_user: dict = Depends(get_current_user)):
+async def get_community_posts(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    after, after_params = keyset_condition(cursor)
+    offset = 0 if cursor else offset
     try:
-        posts = db_client.execute_query(
-            "SELECT * FROM community_posts_with_reply_count WHERE is_anonymous = %s ORDER BY created_at DESC LIMIT %s OFFSET %s",
-            (True, limit, offset)
-        )
-        result = []
-        for post in posts:
-            liked = db_client.execute_query(
-                "SELECT 1 FROM community_post_likes WHERE user_id = %s AND post_id = %s",
-                (current_user["id"], post["id"])
+        # The page itself is shared by every viewer; only liked_by_user is looked up per user
+        page_key, cached = await feed_cache.get_page(limit, offset, cursor, load_feed_posts)
+        if cached is not None:
+            posts, next_cursor = cached
+        else:
+            rows = await async_db_client.execute_query(
+                "SELECT * FROM community_posts_with_reply_count WHERE is_anonymous = %s" + after + keyset_order() + " LIMIT %s OFFSET %s",
+                (True, *after_params, limit + 1, offset)
             )
-            result.append({
-                "id": post["id"],
-                "content": post["content"],
-                "photo_url": post.get("photo_url"),
-                "likes_count": post.get("likes_count", 0),
-                "created_at": post["created_at"],
-                "liked_by_user": bool(liked),
-                "replies_count": post.get("replies_count", 0)
-            })
-        return result
+            rows, next_cursor = keyset_page(rows, limit)
+            posts = await feed_cache.store_page(page_key, rows, next_cursor)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        liked_ids = await get_liked_post_ids(current_user["id"], [post["id"] for post in posts])
+        return [{**like_counter.merge(post), "liked_by_user": post["id"] in liked_ids} for post in posts]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -708,11 +867,10 @@ async def create_community_post(
         raise HTTPException(status_code=400, detail="Content too long (max 500 chars).")
     if is_profane(post_data.content):
         raise HTTPException(status_code=400, detail="Inappropriate language detected.")
-    # Rate limit
-    if not check_rate_limit(current_user["id"], 'post'):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait.")
+    # Charged only once the post is valid, so rejected drafts don't use up the limit
+    await enforce_rate_limit("post", current_user["id"])
     try:
-        post = db_client.execute_insert(
+        post = await async_db_client.execute_insert(
             """
             INSERT INTO community_posts (user_id, content, photo_url, is_anonymous, likes_count, created_at)
             VALUES (%s, %s, %s, %s, %s, %s)
@@ -723,6 +881,7 @@ async def create_community_post(
         
         if not post:
             raise HTTPException(status_code=500, detail="Failed to create post")
+        await feed_cache.invalidate_pages()
         
         return {
             "id": post["id"],
@@ -734,113 +893,60 @@ async def create_community_post(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/community/posts/{post_id}/like")
+@app.post("/api/community/posts/{post_id}/like", dependencies=[Depends(rate_limit("like"))])
 async def like_community_post(post_id: int, current_user: dict = Depends(get_current_user)):
-    if not check_rate_limit(current_user["id"], 'like'):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait.")
     try:
-        # Check if post exists
-        posts = db_client.execute_query(
-            "SELECT * FROM community_posts WHERE id = %s",
-            (post_id,)
-        )
-        if not posts:
-            raise HTTPException(status_code=404, detail="Post not found")
-        post = posts[0]
-        # Check if user already liked
-        existing_like = db_client.execute_query(
-            "SELECT * FROM community_post_likes WHERE user_id = %s AND post_id = %s",
-            (current_user["id"], post_id)
-        )
-        if existing_like:
-            # If already liked, do nothing and return current count
-            updated_post = db_client.execute_query(
-                "SELECT likes_count FROM community_posts WHERE id = %s",
-                (post_id,)
-            )
-            likes_count = updated_post[0]["likes_count"] if updated_post else None
-            return {"success": True, "likes_count": likes_count}
-
-        # Insert like
-        db_client.execute_insert(
+        # One statement: insert the like if it isn't there yet. The counter is bumped write-behind by
+        # like_counter and the owner's notification is queued, so a tap never waits on either.
+        result = await async_db_client.execute_insert(
             """
-            INSERT INTO community_post_likes (user_id, post_id)
-            VALUES (%s, %s)
-            """,
-            (current_user["id"], post_id)
-        )
-
-        # Increment likes_count
-        db_client.execute_update(
-            "UPDATE community_posts SET likes_count = likes_count + 1 WHERE id = %s",
-            (post_id,)
-        )
-
-        # Notification: only if liker is not the post owner
-        if post["user_id"] != current_user["id"]:
-            db_client.execute_insert(
-                """
-                INSERT INTO notifications (user_id, type, post_id, message, created_at)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (
-                    post["user_id"],
-                    'like',
-                    post_id,
-                    f"Your post received a like!",
-                    datetime.utcnow()
-                )
+            WITH post AS (
+                SELECT id, user_id, likes_count FROM community_posts WHERE id = %(post_id)s
+            ), inserted AS (
+                INSERT INTO community_post_likes (user_id, post_id)
+                SELECT %(user_id)s, id FROM post
+                ON CONFLICT (user_id, post_id) DO NOTHING
+                RETURNING post_id
             )
-
-        # Get updated count
-        updated_post = db_client.execute_query(
-            "SELECT likes_count FROM community_posts WHERE id = %s",
-            (post_id,)
+            SELECT post.user_id, post.likes_count, EXISTS (SELECT 1 FROM inserted) AS changed FROM post
+            """,
+            {"post_id": post_id, "user_id": current_user["id"]}
         )
-        likes_count = updated_post[0]["likes_count"] if updated_post else None
-        return {"success": True, "likes_count": likes_count}
+        if not result:
+            raise HTTPException(status_code=404, detail="Post not found")
+        if result["changed"]:
+            like_counter.add(post_id, 1)
+            # Notification: only if liker is not the post owner
+            if result["user_id"] != current_user["id"]:
+                await notification_queue.enqueue(result["user_id"], 'like', "Your post received a like!", post_id=post_id)
+        return {"success": True, "likes_count": like_counter.merge({"id": post_id, "likes_count": result["likes_count"]})["likes_count"]}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.delete("/api/community/posts/{post_id}/like")
+@app.delete("/api/community/posts/{post_id}/like", dependencies=[Depends(rate_limit("like"))])
 async def unlike_community_post(post_id: int, current_user: dict = Depends(get_current_user)):
-    if not check_rate_limit(current_user["id"], 'like'):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait.")
     try:
-        # Check if post exists
-        posts = db_client.execute_query(
-            "SELECT * FROM community_posts WHERE id = %s",
-            (post_id,)
-        )
-        if not posts:
-            raise HTTPException(status_code=404, detail="Post not found")
-
-        # Check if user has liked
-        existing_like = db_client.execute_query(
-            "SELECT * FROM community_post_likes WHERE user_id = %s AND post_id = %s",
-            (current_user["id"], post_id)
-        )
-        if existing_like:
-            # Delete like
-            db_client.execute_update(
-                "DELETE FROM community_post_likes WHERE user_id = %s AND post_id = %s",
-                (current_user["id"], post_id)
-            )
-            # Decrement likes_count, but not below zero
-            db_client.execute_update(
-                "UPDATE community_posts SET likes_count = GREATEST(likes_count - 1, 0) WHERE id = %s",
-                (post_id,)
+        # One statement: delete the like; the decrement goes through like_counter like the increment
+        result = await async_db_client.execute_insert(
+            """
+            WITH post AS (
+                SELECT id, likes_count FROM community_posts WHERE id = %(post_id)s
+            ), removed AS (
+                DELETE FROM community_post_likes
+                WHERE user_id = %(user_id)s AND post_id = %(post_id)s
+                RETURNING post_id
             )
-
-        # Get updated count
-        updated_post = db_client.execute_query(
-            "SELECT likes_count FROM community_posts WHERE id = %s",
-            (post_id,)
+            SELECT post.likes_count, EXISTS (SELECT 1 FROM removed) AS changed FROM post
+            """,
+            {"post_id": post_id, "user_id": current_user["id"]}
         )
-        likes_count = updated_post[0]["likes_count"] if updated_post else None
-        return {"success": True, "likes_count": likes_count}
+        if not result:
+            raise HTTPException(status_code=404, detail="Post not found")
+        if result["changed"]:
+            like_counter.add(post_id, -1)
+        return {"success": True, "likes_count": like_counter.merge({"id": post_id, "likes_count": result["likes_count"]})["likes_count"]}
     except HTTPException:
         raise
     except Exception as e:
@@ -854,18 +960,16 @@ async def create_reply(post_id: int, content: str = Body(...), is_anonymous: boo
         raise HTTPException(status_code=400, detail="Reply too long (max 500 chars).")
     if is_profane(content):
         raise HTTPException(status_code=400, detail="Inappropriate language detected.")
-    if not check_rate_limit(current_user["id"], 'reply'):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait.")
-    try:
-        # Check if post exists
-        posts = db_client.execute_query(
-            "SELECT * FROM community_posts WHERE id = %s",
+    await enforce_rate_limit("reply", current_user["id"])
+    def insert_reply(tx):
+        posts = tx.execute_query(
+            "SELECT user_id FROM community_posts WHERE id = %s",
             (post_id,)
         )
         if not posts:
             raise HTTPException(status_code=404, detail="Post not found")
         post = posts[0]
-        reply = db_client.execute_insert(
+        reply = tx.execute_insert(
             """
             INSERT INTO community_post_replies (post_id, user_id, content, is_anonymous)
             VALUES (%s, %s, %s, %s)
@@ -875,22 +979,14 @@ async def create_reply(post_id: int, content: str = Body(...), is_anonymous: boo
         )
         if not reply:
             raise HTTPException(status_code=500, detail="Failed to create reply")
+        return reply, post["user_id"]
+
+    try:
+        reply, post_owner_id = await async_db_client.run_in_transaction(insert_reply)
+        await feed_cache.invalidate_post(post_id)  # replies_count changed
         # Notification: only if replier is not the post owner
-        if post["user_id"] != current_user["id"]:
-            db_client.execute_insert(
-                """
-                INSERT INTO notifications (user_id, type, post_id, reply_id, message, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    post["user_id"],
-                    'reply',
-                    post_id,
-                    reply["id"],
-                    f"Your post received a reply!",
-                    datetime.utcnow()
-                )
-            )
+        if post_owner_id != current_user["id"]:
+            await notification_queue.enqueue(post_owner_id, 'reply', "Your post received a reply!", post_id=post_id, reply_id=reply["id"])
         return {
             "id": reply["id"],
             "post_id": reply["post_id"],
@@ -899,16 +995,30 @@ async def create_reply(post_id: int, content: str = Body(...), is_anonymous: boo
             "is_anonymous": reply["is_anonymous"],
             "created_at": reply["created_at"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/community/posts/{post_id}/replies")
-async def get_replies(post_id: int, current_user: dict = Depends(get_current_user)):
+async def get_replies(
+    post_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    # Oldest first; without a limit the whole thread is returned as before
+    after, after_params = keyset_condition(cursor, descending=False)
     try:
-        replies = db_client.execute_query(
-            "SELECT * FROM community_post_replies WHERE post_id = %s ORDER BY created_at ASC",
-            (post_id,)
-        )
+        query = "SELECT * FROM community_post_replies WHERE post_id = %s" + after + keyset_order(descending=False)
+        if limit is None:
+            replies = await async_db_client.execute_query(query, (post_id, *after_params))
+        else:
+            replies = await async_db_client.execute_query(query + " LIMIT %s", (post_id, *after_params, limit + 1))
+            replies, next_cursor = keyset_page(replies, limit)
+            if next_cursor:
+                response.headers[NEXT_CURSOR_HEADER] = next_cursor
         return [
             {
                 "id": reply["id"],
@@ -941,17 +1051,20 @@ async def update_user_profile(update: UserProfileUpdate, current_user: dict = De
         raise HTTPException(status_code=400, detail="Email too long (max 100 chars).")
     try:
         # Only allow updating username and (optionally) email
-        db_client.execute_update(
+        await async_db_client.execute_update(
             "UPDATE users SET username = %s{} WHERE id = %s".format(
                 ", email = %s" if update.email else ""
             ),
             (update.username, update.email, current_user["id"]) if update.email else (update.username, current_user["id"])
         )
-        # Return updated profile
-        user = db_client.execute_query(
-            "SELECT * FROM users WHERE id = %s",
-            (current_user["id"],)
-        )[0]
+        invalidate_cached_user(current_user["id"], current_user["email"])
+        # Return updated profile (from the primary, so replica lag can't hide the update)
+        with async_db_client.use_primary():
+            users = await async_db_client.execute_query(
+                "SELECT * FROM users WHERE id = %s",
+                (current_user["id"],)
+            )
+        user = users[0]
         return {
             "id": user["id"],
             "email": user["email"],
@@ -967,26 +1080,30 @@ async def update_user_profile(update: UserProfileUpdate, current_user: dict = De
 async def change_password(req: PasswordChangeRequest, current_user: dict = Depends(get_current_user)):
     try:
         # Get current user
-        user = db_client.execute_query(
+        users = await async_db_client.execute_query(
             "SELECT * FROM users WHERE id = %s",
             (current_user["id"],)
-        )[0]
+        )
+        user = users[0]
         # Check old password
-        if not bcrypt.verify(req.old_password, user["password_hash"]):
+        if not await verify_password_async(req.old_password, user["password_hash"]):
             raise HTTPException(status_code=400, detail="Old password is incorrect")
         # Update password
-        new_hash = bcrypt.hash(req.new_password)
-        db_client.execute_update(
+        new_hash = await get_password_hash_async(req.new_password)
+        await async_db_client.execute_update(
             "UPDATE users SET password_hash = %s WHERE id = %s",
             (new_hash, current_user["id"])
         )
+        invalidate_cached_user(current_user["id"])
         return {"success": True}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/community/posts/{post_id}")
 async def delete_community_post(post_id: int, current_user: dict = Depends(get_current_user)):
-    post = db_client.execute_query(
+    post = await async_db_client.execute_query(
         "SELECT * FROM community_posts WHERE id = %s",
         (post_id,)
     )
@@ -994,15 +1111,17 @@ async def delete_community_post(post_id: int, current_user: dict = Depends(get_c
         raise HTTPException(status_code=404, detail="Post not found")
     if post[0]["user_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete this post.")
-    db_client.execute_update(
+    await async_db_client.execute_update(
         "DELETE FROM community_posts WHERE id = %s",
         (post_id,)
     )
+    await feed_cache.invalidate_post(post_id)
+    await feed_cache.invalidate_pages()
     return {"success": True}
 
 @app.delete("/api/community/replies/{reply_id}")
 async def delete_reply(reply_id: int, current_user: dict = Depends(get_current_user)):
-    reply = db_client.execute_query(
+    reply = await async_db_client.execute_query(
         "SELECT * FROM community_post_replies WHERE id = %s",
         (reply_id,)
     )
@@ -1010,68 +1129,179 @@ async def delete_reply(reply_id: int, current_user: dict = Depends(get_current_u
         raise HTTPException(status_code=404, detail="Reply not found")
     if reply[0]["user_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete this reply.")
-    db_client.execute_update(
+    await async_db_client.execute_update(
         "DELETE FROM community_post_replies WHERE id = %s",
         (reply_id,)
     )
+    await feed_cache.invalidate_post(reply[0]["post_id"])
     return {"success": True}
 
+async def iter_keyset(query: str, params: tuple, cursor: Optional[str], chunk_size: int = DB_ITER_FETCH_SIZE):
+    """Newest-first rows after the cursor, one keyset page per query.
+
+    A connection is only checked out while each chunk is fetched, never while
+    the client downloads the previous one.
+    """
+    while True:
+        after, after_params = keyset_condition(cursor)
+        rows = await async_db_client.execute_query(
+            query + after + keyset_order() + " LIMIT %s", (*params, *after_params, chunk_size)
+        )
+        for row in rows:
+            yield row
+        if len(rows) < chunk_size:
+            return
+        cursor = encode_cursor(rows[-1])
+
+async def keyset_json_response(query: str, params: tuple, limit: Optional[int], cursor: Optional[str], transform=None):
+    """Newest-first rows after the cursor: one keyset page when limit is given, otherwise all of them streamed"""
+    if limit is None:
+        return StreamingResponse(stream_json_array(iter_keyset(query, params, cursor), transform), media_type="application/json")
+    after, after_params = keyset_condition(cursor)
+    query = query + after + keyset_order()
+    rows = await async_db_client.execute_query(query + " LIMIT %s", (*params, *after_params, limit + 1))
+    rows, next_cursor = keyset_page(rows, limit)
+    if transform is not None:
+        rows = [transform(row) for row in rows]
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return JSONResponse(jsonable_encoder(rows), headers=headers)
+
 @app.get("/api/user/posts")
-async def get_user_posts(current_user: dict = Depends(get_current_user)):
-    posts = db_client.execute_query(
-        "SELECT * FROM community_posts WHERE user_id = %s ORDER BY created_at DESC",
-        (current_user["id"],)
+async def get_user_posts(limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    return await keyset_json_response(
+        "SELECT * FROM community_posts WHERE user_id = %s",
+        (current_user["id"],), limit, cursor, transform=like_counter.merge
     )
-    return posts
 
 @app.get("/api/user/replies")
-async def get_user_replies(current_user: dict = Depends(get_current_user)):
-    replies = db_client.execute_query(
-        "SELECT * FROM community_post_replies WHERE user_id = %s ORDER BY created_at DESC",
-        (current_user["id"],)
+async def get_user_replies(limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    return await keyset_json_response(
+        "SELECT * FROM community_post_replies WHERE user_id = %s",
+        (current_user["id"],), limit, cursor
     )
-    return replies
+
+NOTIFICATION_COLUMNS = ", ".join(NOTIFICATION_FIELDS)
+# Seconds between keep-alive comments on an idle notification stream
+NOTIFICATION_STREAM_KEEPALIVE = float(os.getenv("NOTIFICATION_STREAM_KEEPALIVE", "15"))
 
 @app.get("/api/notifications")
-async def get_notifications(current_user: dict = Depends(get_current_user)):
+async def get_notifications(after_id: Optional[int] = None, current_user: dict = Depends(get_current_user)):
     try:
-        notifications = db_client.execute_query(
-            """
-            SELECT id, post_id, reply_id, message, type, read, created_at
-            FROM notifications
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-            LIMIT 50
-            """,
-            (current_user["id"],)
+        if after_id is None:
+            return await async_db_client.execute_query(
+                f"""
+                SELECT {NOTIFICATION_COLUMNS}
+                FROM notifications
+                WHERE user_id = %s
+                ORDER BY created_at DESC
+                LIMIT 50
+                """,
+                (current_user["id"],)
+            )
+        # Resuming: the oldest 50 after the last one seen, from the primary so none just written are missed
+        with async_db_client.use_primary():
+            return await async_db_client.execute_query(
+                f"""
+                SELECT {NOTIFICATION_COLUMNS}
+                FROM notifications
+                WHERE user_id = %s AND id > %s
+                ORDER BY id ASC
+                LIMIT 50
+                """,
+                (current_user["id"], after_id)
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def notification_event(notification) -> str:
+    return f"id: {notification['id']}\nevent: notification\ndata: {json.dumps(jsonable_encoder(notification))}\n\n"
+
+async def notification_events(user_id: int, last_id: Optional[int]):
+    # Subscribe before reading the backlog so nothing written in between is missed; the id check drops duplicates
+    queue = notification_broker.subscribe(user_id)
+    try:
+        if last_id is not None:
+            while True:
+                with async_db_client.use_primary():
+                    missed = await async_db_client.execute_query(
+                        f"SELECT {NOTIFICATION_COLUMNS} FROM notifications WHERE user_id = %s AND id > %s ORDER BY id LIMIT 100",
+                        (user_id, last_id)
+                    )
+                for notification in missed:
+                    last_id = notification["id"]
+                    yield notification_event(notification)
+                if len(missed) < 100:
+                    break
+        yield f"event: unread_count\ndata: {json.dumps({'unread_count': await unread_counter.get(user_id)})}\n\n"
+        while True:
+            try:
+                notification = await asyncio.wait_for(queue.get(), NOTIFICATION_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if notification is None:
+                break  # fell too far behind; the client reconnects with Last-Event-ID
+            if last_id is not None and notification["id"] <= last_id:
+                continue
+            last_id = notification["id"]
+            yield notification_event(notification)
+    finally:
+        notification_broker.unsubscribe(user_id, queue)
+
+@app.get("/api/notifications/stream")
+async def stream_notifications(request: Request, last_id: Optional[int] = None, current_user: dict = Depends(get_current_user)):
+    """Server-sent events: new notifications as they are created, resuming after Last-Event-ID / last_id"""
+    if last_id is None and request.headers.get("last-event-id", "").isdigit():
+        last_id = int(request.headers["last-event-id"])
+    return StreamingResponse(
+        notification_events(current_user["id"], last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/notifications/unread-count")
+async def get_unread_notification_count(current_user: dict = Depends(get_current_user)):
+    try:
+        return {"unread_count": await unread_counter.get(current_user["id"])}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/notifications/read")
+async def mark_notifications_read(req: NotificationsReadRequest, current_user: dict = Depends(get_current_user)):
+    """Mark several notifications read in one statement: by id, up to an id, or all of them"""
+    conditions, params = "", [current_user["id"]]
+    if req.ids is not None:
+        conditions += " AND id = ANY(%s)"
+        params.append(req.ids)
+    if req.up_to_id is not None:
+        conditions += " AND id <= %s"
+        params.append(req.up_to_id)
+    try:
+        updated = await async_db_client.execute_update(
+            "UPDATE notifications SET read = TRUE WHERE user_id = %s AND read = FALSE" + conditions,
+            tuple(params)
         )
-        return notifications
+        unread_counter.invalidate(current_user["id"])
+        return {"success": True, "updated": updated}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.patch("/api/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: int, current_user: dict = Depends(get_current_user)):
+    # Kept for older clients; POST /api/notifications/read marks many at once
     try:
-        db_client.execute_update(
+        await async_db_client.execute_update(
             "UPDATE notifications SET read = TRUE WHERE id = %s AND user_id = %s",
             (notification_id, current_user["id"])
         )
+        unread_counter.invalidate(current_user["id"])
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- 3D Scene Export Job System ---
 # (Simple version: accepts a base64 image, saves it, and tracks job status)
-
-# You should create a new table in your DB for scene_exports:
-# CREATE TABLE scene_exports (
-#   id SERIAL PRIMARY KEY,
-#   user_id INTEGER NOT NULL,
-#   status VARCHAR(20) NOT NULL,
-#   file_url TEXT,
-#   created_at TIMESTAMP NOT NULL DEFAULT NOW(),
-#   updated_at TIMESTAMP NOT NULL DEFAULT NOW()
-# );
+# The scene_exports table is created by migrations.py
 
 @app.post("/api/export-scene")
 async def export_scene(
@@ -1080,7 +1310,7 @@ async def export_scene(
     current_user: dict = Depends(get_current_user)
 ):
     # Insert job into DB
-    job = db_client.execute_insert(
+    job = await async_db_client.execute_insert(
         """
         INSERT INTO scene_exports (user_id, status, created_at, updated_at)
         VALUES (%s, %s, NOW(), NOW()) RETURNING *
@@ -1099,7 +1329,7 @@ async def export_scene(
 
 @app.get("/api/export-scene/{job_id}/status")
 async def get_export_scene_status(job_id: int, current_user: dict = Depends(get_current_user), request: Request = None):
-    jobs = db_client.execute_query(
+    jobs = await async_db_client.execute_query(
         "SELECT * FROM scene_exports WHERE id = %s AND user_id = %s",
         (job_id, current_user["id"])
     )
@@ -1141,7 +1371,7 @@ def process_scene_export_job(job_id: int, image_base64: str):
 async def debug_logs(current_user: dict = Depends(get_current_user)):
     """Debug endpoint to check logs in database"""
     try:
-        logs = db_client.execute_query(
+        logs = await async_db_client.execute_query(
             "SELECT id, photo_url, food_type, guilt_rating, regret_rating FROM junk_food_logs WHERE user_id = %s ORDER BY created_at DESC LIMIT 5",
             (current_user["id"],)
         )
@@ -1153,6 +1383,29 @@ async def debug_logs(current_user: dict = Depends(get_current_user)):
     except Exception as e:
         return {"error": str(e)}
 
+# /debug/db-stats exposes statement text to its caller, so it is off unless explicitly enabled
+DEBUG_DB_STATS_ENABLED = os.getenv("DEBUG_DB_STATS_ENABLED", "false").lower() == "true"
+# Emails allowed to read it once enabled; empty allows any signed-in user (e.g. local development)
+DEBUG_ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("DEBUG_ADMIN_EMAILS", "").split(",") if email.strip()}
+
+@app.get("/debug/db-stats")
+async def debug_db_stats(top: int = 50, reset: bool = False, current_user: dict = Depends(get_current_user)):
+    """Per-statement latency histograms, slow-query count and connection pool metrics"""
+    if not DEBUG_DB_STATS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if DEBUG_ADMIN_EMAILS and current_user["email"].lower() not in DEBUG_ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    stats = query_stats.snapshot(top=top)
+    stats["pool"] = db_client.pool_stats()
+    stats["feed_cache"] = feed_cache.stats()
+    stats["like_counter"] = like_counter.stats()
+    stats["notification_queue"] = notification_queue.stats()
+    stats["notification_streams"] = notification_broker.stats()
+    stats["notification_listener"] = notification_listener.stats()
+    if reset:
+        query_stats.reset()
+    return stats
+
 @app.get("/api/achievements")
 async def get_user_achievements(current_user: dict = Depends(get_current_user)):
     return gamification.get_user_achievements(current_user["id"])
@@ -1165,6 +1418,7 @@ async def unlock_achievement(achievement_id: int = Body(...), current_user: dict
     if not ach:
         return {"message": "Achievement not found"}
     gamification._unlock_achievement(current_user["id"], ach)
+    invalidate_cached_user(current_user["id"])
     return {"message": "Achievement unlocked"}
 
 @app.post("/api/achievements/progress")
@@ -1190,38 +1444,45 @@ async def get_user_xp(current_user: dict = Depends(get_current_user)):
 @app.post("/api/user/xp/add")
 async def add_xp(amount: int = Body(...), current_user: dict = Depends(get_current_user)):
     gamification.award_xp(current_user["id"], amount, reason="manual add")
+    invalidate_cached_user(current_user["id"])
     user = gamification.supabase.table("users").select("xp", "level").eq("id", current_user["id"]).single().execute().data
     return user
 
+# Feedback stats are public and change rarely; cache them briefly and drop the cache on submit
+FEATURE_FEEDBACK_STATS_TTL = float(os.getenv("FEATURE_FEEDBACK_STATS_TTL", "60"))
+feature_feedback_stats_cache = TTLCache(maxsize=1, ttl=FEATURE_FEEDBACK_STATS_TTL)
+
 @app.post("/api/community/feature-feedback")
 async def submit_feature_feedback(request: FeatureFeedbackRequest, current_user: dict = Depends(get_current_user)):
-    for feature_id in request.features:
-        db_client.execute_insert(
-            """
-            INSERT INTO community_feature_feedback (user_id, feature_id, created_at)
-            VALUES (%s, %s, %s)
-            """,
-            (current_user["id"], feature_id, datetime.utcnow())
-        )
+    now = datetime.utcnow()
+    await async_db_client.execute_many(
+        "INSERT INTO community_feature_feedback (user_id, feature_id, created_at) VALUES %s",
+        [(current_user["id"], feature_id, now) for feature_id in request.features]
+    )
+    feature_feedback_stats_cache.clear()
     return {"success": True}
 
 @app.get("/api/community/feature-feedback-stats")
 async def get_feature_feedback_stats():
-    # Get all feedback
-    feedback = db_client.execute_query("SELECT feature_id, user_id FROM community_feature_feedback")
-    if not feedback:
-        return {}
-    # Count unique users per feature
-    feature_user = {}
-    for row in feedback:
-        feature_user.setdefault(row["feature_id"], set()).add(row["user_id"])
-    # Total unique users who gave feedback
-    all_users = set(row["user_id"] for row in feedback)
-    total_users = len(all_users)
+    stats = feature_feedback_stats_cache.get("stats")
+    if stats is not None:
+        return stats
+    # Unique users per feature plus the overall unique users (the () grouping set) in one query
+    rows = await async_db_client.execute_query(
+        """
+        SELECT feature_id, GROUPING(feature_id) = 1 AS is_total, COUNT(DISTINCT user_id) AS users
+        FROM community_feature_feedback
+        GROUP BY GROUPING SETS ((feature_id), ())
+        """
+    )
+    total_users = next((row["users"] for row in rows if row["is_total"]), 0)
     # Calculate percent for each feature
     stats = {}
-    for feature_id, users in feature_user.items():
-        stats[feature_id] = round(100 * len(users) / total_users, 1) if total_users else 0
+    if total_users:
+        for row in rows:
+            if not row["is_total"]:
+                stats[row["feature_id"]] = round(100 * row["users"] / total_users, 1)
+    feature_feedback_stats_cache.set("stats", stats)
     return stats
 
 # Test endpoints for gamification testing
@@ -1237,7 +1498,8 @@ async def simulate_streak(days: int = Body(...), current_user: dict = Depends(ge
         SET current_streak = $1, best_streak = GREATEST(best_streak, $1)
         WHERE id = $2
         """
-        await db_client.execute(query, days, user_id)
+        await async_db_client.execute(query, days, user_id)
+        invalidate_cached_user(user_id)
         
         # Trigger achievement check
         gamification_service = GamificationService()
@@ -1252,27 +1514,58 @@ async def simulate_streak(days: int = Body(...), current_user: dict = Depends(ge
         print(f"Error simulating streak: {e}")
         raise HTTPException(status_code=500, detail="Failed to simulate streak")
 
+# Most placeholder logs one simulate-logs call will add
+SIMULATED_LOGS_MAX = 1000
+
 @app.post("/api/test/gamification/simulate-logs")
-async def simulate_logs(count: int = Body(...), current_user: dict = Depends(get_current_user)):
+async def simulate_logs(count: int = Body(..., ge=0, le=SIMULATED_LOGS_MAX), current_user: dict = Depends(get_current_user)):
     """Simulate logging junk food items for testing achievements"""
     try:
         user_id = current_user['id']
         
-        # Update user's total logs in the database
-        query = """
-        UPDATE users 
-        SET total_logs = $1
-        WHERE id = $2
-        """
-        await db_client.execute(query, count, user_id)
+        # total_logs is derived from junk_food_logs, so add placeholder logs up to count, through the
+        # same rollup and totals CTEs as /api/logs so both stay in step with the logs
+        def add_simulated_logs(tx):
+            existing = tx.execute_query("SELECT COUNT(*) AS logs FROM junk_food_logs WHERE user_id = %s", (user_id,))[0]["logs"]
+            added = tx.execute_many(
+                """
+                WITH inserted AS (
+                    INSERT INTO junk_food_logs (user_id, food_type, guilt_rating, regret_rating, estimated_cost, created_at)
+                    VALUES %s
+                    RETURNING *
+                ), rolled_up AS (""" + rollup_delta_sql("inserted") + """
+                ), totals AS (""" + totals_delta_sql("inserted") + """)
+                SELECT id FROM inserted
+                """,
+                [(user_id, "Simulated log", 5, 5, 0, datetime.utcnow())] * max(count - existing, 0)
+            )
+            return existing + len(added), [row["id"] for row in added]
+
+        total, added_ids = await async_db_client.run_in_transaction(add_simulated_logs)
+        invalidate_cached_user(user_id)
         
-        # Trigger achievement check
-        gamification_service = GamificationService()
-        await gamification_service.check_and_unlock_achievements(user_id, "milestone")
+        # Trigger achievement check; if it fails, take the placeholder logs back out so the call
+        # leaves nothing behind
+        try:
+            await check_and_unlock_achievements(user_id, event_type="milestone")
+        except Exception:
+            if added_ids:
+                await async_db_client.execute_update(
+                    """
+                    WITH deleted AS (
+                        DELETE FROM junk_food_logs WHERE id = ANY(%s) RETURNING *
+                    ), rolled_up AS (""" + rollup_delta_sql("deleted", sign=-1) + """
+                    ), totals AS (""" + totals_delta_sql("deleted", sign=-1) + """)
+                    SELECT COUNT(*) FROM deleted
+                    """,
+                    (added_ids,)
+                )
+                invalidate_cached_user(user_id)
+            raise
         
         return {
-            "message": f"Simulated {count} total logs",
-            "total_logs": count
+            "message": f"Simulated {total} total logs",
+            "total_logs": total
         }
     except Exception as e:
         print(f"Error simulating logs: {e}")
@@ -1286,13 +1579,14 @@ async def add_test_xp(amount: int = Body(...), current_user: dict = Depends(get_
         
         # Get current XP and add the amount
         query = "SELECT total_xp FROM users WHERE id = $1"
-        result = await db_client.fetch_one(query, user_id)
+        result = await async_db_client.fetch_one(query, user_id)
         current_xp = result['total_xp'] if result else 0
         new_xp = current_xp + amount
         
         # Update user's XP
         update_query = "UPDATE users SET total_xp = $1 WHERE id = $2"
-        await db_client.execute(update_query, new_xp, user_id)
+        await async_db_client.execute(update_query, new_xp, user_id)
+        invalidate_cached_user(user_id)
         
         return {
             "message": f"Added {amount} XP",
@@ -1314,7 +1608,7 @@ async def unlock_test_achievement(achievement_id: str = Body(...), current_user:
         SELECT * FROM user_achievements 
         WHERE user_id = $1 AND achievement_id = $2
         """
-        result = await db_client.fetch_one(query, user_id, achievement_id)
+        result = await async_db_client.fetch_one(query, user_id, achievement_id)
         
         if result:
             return {"message": "Achievement already unlocked"}
@@ -1324,7 +1618,7 @@ async def unlock_test_achievement(achievement_id: str = Body(...), current_user:
         INSERT INTO user_achievements (user_id, achievement_id, unlocked_at)
         VALUES ($1, $2, NOW())
         """
-        await db_client.execute(insert_query, user_id, achievement_id)
+        await async_db_client.execute(insert_query, user_id, achievement_id)
         
         return {
             "message": f"Unlocked achievement: {achievement_id}",
@@ -1346,15 +1640,17 @@ async def reset_test_user(current_user: dict = Depends(get_current_user)):
         SET 
             current_streak = 0,
             best_streak = 0,
-            total_logs = 0,
             total_xp = 0
         WHERE id = $1
         """
-        await db_client.execute(reset_query, user_id)
+        await async_db_client.execute(reset_query, user_id)
+        # Totals follow the user's logs; recount them rather than zeroing total_logs out from under the rollup
+        await async_db_client.run(backfill, db_client, user_id)
+        invalidate_cached_user(user_id)
         
         # Delete all achievements
         delete_achievements_query = "DELETE FROM user_achievements WHERE user_id = $1"
-        await db_client.execute(delete_achievements_query, user_id)
+        await async_db_client.execute(delete_achievements_query, user_id)
         
         return {
             "message": "Reset user gamification data",
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the JunkStop PostgreSQL database.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # list applied / pending migrations
+
+Each migration runs in its own transaction and is recorded in
+schema_migrations, so it is applied exactly once per database. Never edit a
+migration that has shipped; append a new one instead.
+"""
+import sys
+from datetime import datetime
+from typing import List, Tuple
+
+from database import DATABASE_SCHEMA
+from postgres_client import db_client, PostgreSQLClient
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent workers don't migrate at the same time
+MIGRATION_LOCK_ID = 7263001
+
+# Composite indexes matching the WHERE ... ORDER BY shapes of the hot queries, as of the
+# latest migration that touches them (benchmarks/bench_query_plans.py drops these by name)
+HOT_QUERY_INDEXES = [
+    # Every log list, analytics and AI-context query: user_id = ? ORDER BY created_at DESC, id DESC
+    ("idx_junk_food_logs_user_created", "junk_food_logs (user_id, created_at DESC, id DESC)"),
+    # Notification list: user_id = ? ORDER BY created_at DESC
+    ("idx_notifications_user_created", "notifications (user_id, created_at DESC)"),
+    # Stream resume: user_id = ? AND id > ? ORDER BY id
+    ("idx_notifications_user_id", "notifications (user_id, id)"),
+    # Unread count and bulk mark-read only touch unread rows
+    ("idx_notifications_user_unread", "notifications (user_id, id) WHERE read = FALSE"),
+    # Replies under a post, oldest first
+    ("idx_community_post_replies_post_created", "community_post_replies (post_id, created_at, id)"),
+    # "My replies": user_id = ? ORDER BY created_at DESC, id DESC
+    ("idx_community_post_replies_user_created", "community_post_replies (user_id, created_at DESC, id DESC)"),
+    # Community feed: is_anonymous = ? ORDER BY created_at DESC, id DESC
+    ("idx_community_posts_anonymous_created", "community_posts (is_anonymous, created_at DESC, id DESC)"),
+    # "My posts": user_id = ? ORDER BY created_at DESC, id DESC
+    ("idx_community_posts_user_created", "community_posts (user_id, created_at DESC, id DESC)"),
+    # Feature feedback stats: COUNT(DISTINCT user_id) GROUP BY feature_id
+    ("idx_community_feature_feedback_feature_user", "community_feature_feedback (feature_id, user_id)"),
+    # Likes per post (the UNIQUE (user_id, post_id) index only serves lookups by user)
+    ("idx_community_post_likes_post", "community_post_likes (post_id)"),
+    # Startup like-count replay: posts liked since created_at > ?
+    ("idx_community_post_likes_created", "community_post_likes (created_at)"),
+]
+
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (
+        1,
+        "base_schema",
+        "\n".join(DATABASE_SCHEMA.values()),
+    ),
+    (
+        2,
+        "notifications_scene_exports_user_achievements",
+        """
+        CREATE TABLE IF NOT EXISTS notifications (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            type VARCHAR(20) NOT NULL,
+            post_id INTEGER REFERENCES community_posts(id) ON DELETE CASCADE,
+            reply_id INTEGER REFERENCES community_post_replies(id) ON DELETE CASCADE,
+            message TEXT,
+            read BOOLEAN NOT NULL DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS scene_exports (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            status VARCHAR(20) NOT NULL,
+            file_url TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        CREATE TABLE IF NOT EXISTS user_achievements (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            achievement_id INTEGER NOT NULL,
+            progress INTEGER DEFAULT 0,
+            unlocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (user_id, achievement_id)
+        );
+        """,
+    ),
+    (
+        3,
+        "community_posts_with_reply_count_view",
+        # Correlated count so a LIMITed feed page only counts replies for the posts it returns
+        """
+        CREATE OR REPLACE VIEW community_posts_with_reply_count AS
+        SELECT
+            p.*,
+            (SELECT COUNT(*) FROM community_post_replies r WHERE r.post_id = p.id) AS replies_count
+        FROM community_posts p;
+        """,
+    ),
+    (
+        4,
+        "hot_query_indexes",
+        """
+        CREATE INDEX IF NOT EXISTS idx_junk_food_logs_user_created ON junk_food_logs (user_id, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON notifications (user_id, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_community_post_replies_post_created ON community_post_replies (post_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_community_post_replies_user_created ON community_post_replies (user_id, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_community_posts_anonymous_created ON community_posts (is_anonymous, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_community_posts_user_created ON community_posts (user_id, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_community_post_likes_post ON community_post_likes (post_id);
+        """,
+    ),
+    (
+        5,
+        "keyset_pagination_indexes",
+        # Keyset pages filter on (created_at, id) < (?, ?); with id as the trailing key column the
+        # row comparison becomes an index condition instead of a filter over every older row
+        """
+        DROP INDEX IF EXISTS idx_junk_food_logs_user_created;
+        CREATE INDEX idx_junk_food_logs_user_created ON junk_food_logs (user_id, created_at DESC, id DESC);
+        DROP INDEX IF EXISTS idx_community_post_replies_post_created;
+        CREATE INDEX idx_community_post_replies_post_created ON community_post_replies (post_id, created_at, id);
+        DROP INDEX IF EXISTS idx_community_post_replies_user_created;
+        CREATE INDEX idx_community_post_replies_user_created ON community_post_replies (user_id, created_at DESC, id DESC);
+        DROP INDEX IF EXISTS idx_community_posts_anonymous_created;
+        CREATE INDEX idx_community_posts_anonymous_created ON community_posts (is_anonymous, created_at DESC, id DESC);
+        DROP INDEX IF EXISTS idx_community_posts_user_created;
+        CREATE INDEX idx_community_posts_user_created ON community_posts (user_id, created_at DESC, id DESC);
+        """,
+    ),
+    (
+        6,
+        "notification_stream_indexes",
+        """
+        CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications (user_id, id);
+        CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON notifications (user_id, id) WHERE read = FALSE;
+        """,
+    ),
+    (
+        7,
+        "feature_feedback_stats_index",
+        # Lets the per-feature COUNT(DISTINCT user_id) run as an index-only scan
+        """
+        CREATE INDEX IF NOT EXISTS idx_community_feature_feedback_feature_user ON community_feature_feedback (feature_id, user_id);
+        """,
+    ),
+    (
+        8,
+        "user_daily_stats_rollup",
+        # Maintained by the log insert/delete statements from here on; rollup.py --check verifies it
+        """
+        CREATE TABLE IF NOT EXISTS user_daily_stats (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            log_count INTEGER NOT NULL DEFAULT 0,
+            guilt_sum INTEGER NOT NULL DEFAULT 0,
+            regret_sum INTEGER NOT NULL DEFAULT 0,
+            cost_sum DECIMAL(12,2) NOT NULL DEFAULT 0,
+            calories_sum BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        );
+        INSERT INTO user_daily_stats (user_id, day, log_count, guilt_sum, regret_sum, cost_sum, calories_sum)
+        SELECT
+            user_id,
+            created_at::date,
+            COUNT(*),
+            COALESCE(SUM(guilt_rating), 0),
+            COALESCE(SUM(regret_rating), 0),
+            COALESCE(SUM(estimated_cost), 0),
+            COALESCE(SUM(estimated_calories), 0)
+        FROM junk_food_logs
+        WHERE user_id IS NOT NULL AND created_at IS NOT NULL
+        GROUP BY user_id, created_at::date
+        ON CONFLICT (user_id, day) DO NOTHING;
+        """,
+    ),
+    (
+        9,
+        "user_running_totals",
+        # Lifetime totals read by the profile; total_guilt_score (already on users) holds the guilt sum
+        """
+        ALTER TABLE users
+            ADD COLUMN IF NOT EXISTS total_logs INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS total_cost DECIMAL(12,2) NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS total_calories BIGINT NOT NULL DEFAULT 0;
+        UPDATE users SET (total_logs, total_guilt_score, total_cost, total_calories) = (
+            SELECT
+                COUNT(*),
+                COALESCE(SUM(guilt_rating), 0),
+                COALESCE(SUM(estimated_cost), 0),
+                COALESCE(SUM(estimated_calories), 0)
+            FROM junk_food_logs
+            WHERE user_id = users.id AND created_at IS NOT NULL
+        );
+        ALTER TABLE users
+            ALTER COLUMN total_guilt_score SET DEFAULT 0,
+            ALTER COLUMN total_guilt_score SET NOT NULL;
+        """,
+    ),
+    (
+        10,
+        "notifications_notify_trigger",
+        # Tells every worker's NotificationListener (notifications.py) about new, read and deleted
+        # notifications. Identical payloads in one transaction are delivered once, so marking many
+        # notifications read sends a single event per user.
+        """
+        CREATE OR REPLACE FUNCTION notifications_notify() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM pg_notify('notifications', json_build_object('op', 'insert', 'id', NEW.id, 'user_id', NEW.user_id, 'read', NEW.read)::text);
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM pg_notify('notifications', json_build_object('op', 'read', 'user_id', NEW.user_id)::text);
+            ELSE
+                PERFORM pg_notify('notifications', json_build_object('op', 'read', 'user_id', OLD.user_id)::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        DROP TRIGGER IF EXISTS notifications_notify ON notifications;
+        CREATE TRIGGER notifications_notify
+            AFTER INSERT OR DELETE OR UPDATE OF read ON notifications
+            FOR EACH ROW EXECUTE FUNCTION notifications_notify();
+        """,
+    ),
+    (
+        11,
+        "community_post_likes_created_index",
+        # Lets LikeCounter.replay find the recently liked posts without scanning every like
+        """
+        CREATE INDEX IF NOT EXISTS idx_community_post_likes_created ON community_post_likes (created_at);
+        """,
+    ),
+]
+
+def _ensure_migrations_table(tx):
+    tx.execute_update(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+def applied_versions(client: PostgreSQLClient = db_client) -> List[int]:
+    with client.transaction() as tx:
+        _ensure_migrations_table(tx)
+        return [row["version"] for row in tx.execute_query("SELECT version FROM schema_migrations ORDER BY version")]
+
+def run_migrations(client: PostgreSQLClient = db_client) -> List[int]:
+    """Apply every pending migration in version order and return the versions applied"""
+    applied = []
+    for version, name, statements in MIGRATIONS:
+        with client.transaction() as tx:
+            tx.execute_query("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            _ensure_migrations_table(tx)
+            if tx.execute_query("SELECT 1 FROM schema_migrations WHERE version = %s", (version,)):
+                continue
+            print(f"Applying migration {version:03d}_{name}...")
+            tx.execute_update(statements)
+            tx.execute_update(
+                "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, %s)",
+                (version, name, datetime.utcnow())
+            )
+            applied.append(version)
+    return applied
+
+if __name__ == "__main__":
+    if "--status" in sys.argv:
+        done = set(applied_versions())
+        for version, name, _ in MIGRATIONS:
+            print(f"{'applied' if version in done else 'pending'}  {version:03d}_{name}")
+    else:
+        applied = run_migrations()
+        print(f"Applied {len(applied)} migration(s)" if applied else "Database schema is up to date")
@@ -72,6 +72,10 @@ class CommunityPostCreate(BaseModel):
 class FeatureFeedbackRequest(BaseModel):
     features: List[str]
 
+class NotificationsReadRequest(BaseModel):
+    ids: Optional[List[int]] = None  # mark these notifications read
+    up_to_id: Optional[int] = None  # or every notification with id <= up_to_id; neither marks all read
+
 class CommunityPostResponse(BaseModel):
     id: int
     content: str
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from postgres_client import async_db_client, AsyncPostgreSQLClient
+from cache import TTLCache
+
+load_dotenv()
+
+# Notifications are queued in-process and written by one worker, so likes and replies respond
+# without waiting on the insert and a burst of them becomes a single multi-row INSERT. Open streams
+# and unread counts are fed from Postgres LISTEN/NOTIFY, so they see rows written by any worker.
+NOTIFICATION_QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", "10000"))
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "500"))
+# How long the worker waits for more notifications to join a batch once it has one
+NOTIFICATION_BATCH_WAIT_MS = int(os.getenv("NOTIFICATION_BATCH_WAIT_MS", "20"))
+# When the queue is full a request waits this long for room, then writes its notification itself
+NOTIFICATION_ENQUEUE_TIMEOUT = float(os.getenv("NOTIFICATION_ENQUEUE_TIMEOUT", "1.0"))
+NOTIFICATION_MAX_RETRIES = 3
+# Notifications buffered per open stream; a client that falls further behind is disconnected and
+# catches up from the database when it reconnects with its last-seen id
+NOTIFICATION_STREAM_BUFFER = int(os.getenv("NOTIFICATION_STREAM_BUFFER", "100"))
+UNREAD_COUNT_TTL = float(os.getenv("UNREAD_COUNT_TTL", "300"))
+# Seconds between attempts to (re)open the LISTEN connection
+NOTIFICATION_LISTEN_RETRY = float(os.getenv("NOTIFICATION_LISTEN_RETRY", "5"))
+# pg_notify channel of the notifications trigger (migration 10)
+NOTIFICATION_CHANNEL = "notifications"
+
+_COLUMNS = ("user_id", "type", "post_id", "reply_id", "message", "created_at")
+# Rows whose recipient, post or reply was deleted while they sat in the queue are skipped instead of
+# failing the whole batch on the foreign key
+_INSERT = f"""
+    INSERT INTO notifications ({', '.join(_COLUMNS)})
+    SELECT v.*
+    FROM (VALUES %s) AS v({', '.join(_COLUMNS)})
+    WHERE EXISTS (SELECT 1 FROM users u WHERE u.id = v.user_id)
+      AND (v.post_id IS NULL OR EXISTS (SELECT 1 FROM community_posts p WHERE p.id = v.post_id))
+      AND (v.reply_id IS NULL OR EXISTS (SELECT 1 FROM community_post_replies r WHERE r.id = v.reply_id))
+    RETURNING *
+"""
+_TEMPLATE = "(%s::int, %s::varchar, %s::int, %s::int, %s::text, %s::timestamp)"
+
+# Columns sent to clients, shared by the list endpoint and the stream
+NOTIFICATION_FIELDS = ("id", "post_id", "reply_id", "message", "type", "read", "created_at")
+
+class NotificationBroker:
+    """Fans newly written notifications out to the open streams of their recipients in this process"""
+
+    def __init__(self, buffer_size: int = NOTIFICATION_STREAM_BUFFER):
+        self.buffer_size = buffer_size
+        self._subscribers: Dict[int, set] = {}
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return user_id in self._subscribers
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.buffer_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def publish(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            for queue in list(self._subscribers.get(row["user_id"], ())):
+                try:
+                    queue.put_nowait({field: row.get(field) for field in NOTIFICATION_FIELDS})
+                except asyncio.QueueFull:
+                    # Slow consumer: end its stream (None) rather than buffer without bound
+                    self.unsubscribe(row["user_id"], queue)
+                    queue.get_nowait()
+                    queue.put_nowait(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribed_users": len(self._subscribers),
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+        }
+
+class UnreadCounter:
+    """Per-user unread notification counts, counted once from the database and then kept up to date"""
+
+    def __init__(self, client: AsyncPostgreSQLClient = async_db_client, ttl: float = UNREAD_COUNT_TTL):
+        self.client = client
+        self._counts = TTLCache(maxsize=100000, ttl=ttl)
+
+    async def get(self, user_id: int) -> int:
+        count = self._counts.get(user_id)
+        if count is None:
+            with self.client.use_primary():  # a replica could miss notifications just written
+                rows = await self.client.execute_query(
+                    "SELECT COUNT(*) AS unread FROM notifications WHERE user_id = %s AND read = FALSE",
+                    (user_id,)
+                )
+            count = rows[0]["unread"]
+            self._counts.set(user_id, count)
+        return count
+
+    def add(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            count = self._counts.get(row["user_id"])
+            if count is not None and not row.get("read"):
+                self._counts.set(row["user_id"], count + 1)
+
+    def invalidate(self, user_id: int):
+        self._counts.delete(user_id)
+
+    def clear(self):
+        self._counts.clear()
+
+notification_broker = NotificationBroker()
+unread_counter = UnreadCounter()
+
+class NotificationListener:
+    """LISTENs on NOTIFICATION_CHANNEL so every worker's streams and unread counts see the notifications
+    written, read or deleted through any worker. A trigger on notifications sends the events; new rows are
+    loaded (by id) only for recipients with a stream open in this process."""
+
+    def __init__(self, client: AsyncPostgreSQLClient = async_db_client, broker: NotificationBroker = notification_broker,
+                 counter: UnreadCounter = unread_counter, channel: str = NOTIFICATION_CHANNEL):
+        self.client = client
+        self.broker = broker
+        self.counter = counter
+        self.channel = channel
+        self._conn = None
+        self._task = None
+        self._pending_ids: List[int] = []
+        self._publishing = None
+        self.events = 0
+        self.reconnects = 0
+
+    @property
+    def listening(self) -> bool:
+        return self._conn is not None
+
+    def _connect(self):
+        conn = self.client.client.get_connection(keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.channel}")
+        return conn
+
+    def _on_readable(self, conn, lost: asyncio.Future):
+        try:
+            conn.poll()
+        except Exception as e:
+            if not lost.done():
+                lost.set_result(e)
+            return
+        while conn.notifies:
+            self.events += 1
+            try:
+                self._handle(json.loads(conn.notifies.pop(0).payload))
+            except Exception as e:
+                print(f"Failed to handle notification event: {e}")
+
+    def _handle(self, event: Dict[str, Any]):
+        if event["op"] != "insert":
+            # Marked read or deleted: recount on the next request
+            self.counter.invalidate(event["user_id"])
+            return
+        self.counter.add([event])
+        if self.broker.has_subscribers(event["user_id"]):
+            self._pending_ids.append(event["id"])
+            if self._publishing is None or self._publishing.done():
+                self._publishing = asyncio.ensure_future(self._publish_pending())
+
+    async def _publish_pending(self):
+        while self._pending_ids:
+            ids, self._pending_ids = self._pending_ids, []
+            try:
+                with self.client.use_primary():
+                    rows = await self.client.execute_query(
+                        "SELECT * FROM notifications WHERE id = ANY(%s) ORDER BY id",
+                        (ids,)
+                    )
+            except Exception as e:
+                # Streams that missed these pick them up from the database when they reconnect
+                print(f"Failed to load {len(ids)} notification(s) for streaming: {e}")
+                continue
+            self.broker.publish(rows)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                conn = await self.client.run(self._connect)
+            except Exception as e:
+                print(f"Failed to listen for notifications, retrying in {NOTIFICATION_LISTEN_RETRY}s: {e}")
+                await asyncio.sleep(NOTIFICATION_LISTEN_RETRY)
+                continue
+            lost = loop.create_future()
+            fd = conn.fileno()  # psycopg2 won't report it once the connection is closed
+            loop.add_reader(fd, self._on_readable, conn, lost)
+            self._conn = conn
+            # Counts cached while nothing was listening may have missed other workers' changes
+            self.counter.clear()
+            try:
+                error = await lost
+                print(f"Lost the notification LISTEN connection, reconnecting: {error}")
+            finally:
+                loop.remove_reader(fd)
+                self._conn = None
+                conn.close()
+            self.reconnects += 1
+            await asyncio.sleep(NOTIFICATION_LISTEN_RETRY)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "listening": self.listening,
+            "events": self.events,
+            "reconnects": self.reconnects,
+        }
+
+notification_listener = NotificationListener()
+
+class NotificationQueue:
+    """Bounded queue of pending notifications plus the worker that batches them into the database"""
+
+    def __init__(self, client: AsyncPostgreSQLClient = async_db_client, maxsize: int = NOTIFICATION_QUEUE_SIZE,
+                 batch_size: int = NOTIFICATION_BATCH_SIZE, batch_wait_ms: int = NOTIFICATION_BATCH_WAIT_MS):
+        self.client = client
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task = None
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.direct_writes = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+        return self._queue
+
+    async def enqueue(self, user_id: int, type: str, message: str, post_id: Optional[int] = None, reply_id: Optional[int] = None):
+        """Queue a notification; waits (back-pressure) only while the queue is full"""
+        row = (user_id, type, post_id, reply_id, message, datetime.utcnow())
+        self.enqueued += 1
+        if self._task is None:
+            # No worker running (e.g. scripts and tests without startup events)
+            await self._write([row])
+            return
+        try:
+            self.queue.put_nowait(row)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self.queue.put(row), NOTIFICATION_ENQUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.direct_writes += 1
+                await self._write([row])
+
+    async def _next_batch(self) -> List[tuple]:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, rows: List[tuple]) -> List[Dict[str, Any]]:
+        for attempt in range(1, NOTIFICATION_MAX_RETRIES + 1):
+            try:
+                written = await self.client.execute_many(_INSERT, rows, template=_TEMPLATE)
+                break
+            except Exception as e:
+                print(f"Failed to write {len(rows)} notification(s) (attempt {attempt}): {e}")
+                if attempt < NOTIFICATION_MAX_RETRIES:
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+        else:
+            self.dropped += len(rows)
+            return []
+        self.written += len(written)
+        self.skipped += len(rows) - len(written)
+        self.batches += 1
+        if not notification_listener.listening:
+            # Normally the rows come back through the listener, for every worker at once; without it
+            # (scripts, or while reconnecting) at least this process's streams and counts see them.
+            # Only committed rows are pushed, so streamed ids are always resumable from the database
+            unread_counter.add(written)
+            notification_broker.publish(written)
+        return written
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Wait for queued notifications to be written, then stop the worker"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Notification queue not drained on shutdown; {self.queue.qsize()} notification(s) lost")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "maxsize": self.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "direct_writes": self.direct_writes,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+        }
+
+# Global notification queue
+notification_queue = NotificationQueue()
@@ -0,0 +1,45 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+
+# Opaque keyset cursors over (created_at, id). Paging by the last row seen instead of
+# OFFSET lets Postgres seek straight into the (…, created_at, id) index, so page 500
+# costs the same as page 1 and rows inserted meanwhile never shift the pages.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    created_at = row["created_at"]
+    if hasattr(created_at, "isoformat"):
+        created_at = created_at.isoformat()
+    payload = json.dumps([created_at, row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_condition(cursor: Optional[str], descending: bool = True) -> Tuple[str, tuple]:
+    """SQL fragment (to AND into a WHERE clause) selecting rows after the cursor"""
+    if not cursor:
+        return "", ()
+    created_at, row_id = decode_cursor(cursor)
+    operator = "<" if descending else ">"
+    return f" AND (created_at, id) {operator} (%s, %s)", (created_at, row_id)
+
+def keyset_order(descending: bool = True) -> str:
+    direction = "DESC" if descending else "ASC"
+    return f" ORDER BY created_at {direction}, id {direction}"
+
+def keyset_page(rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Split rows fetched with LIMIT limit + 1 into the page and the cursor for the next one"""
+    if len(rows) <= limit or limit < 1:
+        return rows[:max(limit, 0)], None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1])
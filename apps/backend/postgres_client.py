@@ -1,48 +1,586 @@
 import os
 from dotenv import load_dotenv
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from typing import List, Dict, Any, Optional
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, execute_values
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import csv
+import functools
+import io
+import itertools
+import re
+import threading
+import time
+import uuid
 import bcrypt
 from datetime import datetime
+from query_stats import query_stats, call_site_var, find_call_site
 
 load_dotenv()
+
+# Connection pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))  # close idle connections above min size after this
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))  # ping connections idle longer than this
+DB_POOL_PING_TIMEOUT = float(os.getenv("DB_POOL_PING_TIMEOUT", "5"))  # seconds before a ping (or connect) to a dead server fails
+DB_ITER_FETCH_SIZE = int(os.getenv("DB_ITER_FETCH_SIZE", "500"))  # rows per round trip for iter_query
+DB_REPLICA_STRATEGY = os.getenv("DB_REPLICA_STRATEGY", "round_robin")  # or "least_busy"
+DB_REPLICA_RETRY_AFTER = float(os.getenv("DB_REPLICA_RETRY_AFTER", "5"))  # seconds to skip a replica after it fails
+DB_ASYNC_WORKERS = int(os.getenv("DB_ASYNC_WORKERS", str(DB_POOL_MAX_SIZE)))  # threads serving AsyncPostgreSQLClient
+
+_NUMBERED_PARAM = re.compile(r"\$(\d+)")
+_RETURNING = re.compile(r"\bRETURNING\b", re.IGNORECASE)
+
+# True inside use_primary(): reads in this context must see this request's writes
+_pin_primary: contextvars.ContextVar[bool] = contextvars.ContextVar("db_pin_primary", default=False)
+
+class PoolExhaustedError(Exception):
+    """Raised when no pooled connection becomes available within the acquire timeout"""
+
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool with health checks and idle reaping"""
+
+    def __init__(
+        self,
+        connection_string: Optional[str],
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        acquire_timeout: float = DB_POOL_ACQUIRE_TIMEOUT,
+        idle_timeout: float = DB_POOL_IDLE_TIMEOUT,
+        health_check_interval: float = DB_POOL_HEALTH_CHECK_INTERVAL,
+    ):
+        self.connection_string = connection_string
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()  # (connection, last_used_monotonic), most recently used on the right
+        self._in_use = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self.metrics = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "acquired": 0,
+            "acquire_waits": 0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "idle_reaped": 0,
+        }
+
+    def _count(self, metric: str):
+        with self._cond:  # reentrant, so callers may already hold it
+            self.metrics[metric] += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(
+            self.connection_string,
+            cursor_factory=RealDictCursor,
+            connect_timeout=max(1, int(DB_POOL_PING_TIMEOUT)),
+            # Fail writes to a silently dead server (e.g. after a failover) instead of hanging
+            keepalives=1,
+            tcp_user_timeout=int(DB_POOL_PING_TIMEOUT * 1000),
+        )
+        self._count("connections_created")
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._count("connections_closed")
+
+    def _is_healthy(self, conn, idle_for: float) -> bool:
+        """Cheap liveness check; only pings connections that sat idle for a while. Call without the lock."""
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SET LOCAL statement_timeout = {int(DB_POOL_PING_TIMEOUT * 1000)}; SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _reap_idle(self):
+        """Close connections idle longer than idle_timeout, keeping min_size open. Caller holds the lock."""
+        now = time.monotonic()
+        # Oldest idle connections sit on the left
+        while self._idle and len(self._idle) + self._in_use > self.min_size:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._close(conn)
+            self.metrics["idle_reaped"] += 1
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Check out a healthy connection, opening a new one if below max_size"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                self._reap_idle()
+                while True:
+                    if self._idle:
+                        # Take it off the free list (reserving its slot); it is pinged after the lock is released
+                        conn, last_used = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._in_use < self.max_size:
+                        # Reserve the slot before connecting so concurrent callers respect max_size
+                        conn, last_used = None, None
+                        self._in_use += 1
+                        break
+
+                    self.metrics["exhausted"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.metrics["timeouts"] += 1
+                        raise PoolExhaustedError(
+                            f"No database connection available within {timeout}s (max_size={self.max_size})"
+                        )
+                    self.metrics["acquire_waits"] += 1
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+            if conn is not None:
+                if self._is_healthy(conn, time.monotonic() - last_used):
+                    self._count("acquired")
+                    return conn
+                self._count("health_check_failures")
+                self._close(conn)
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                continue
+
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            self._count("acquired")
+            return conn
+
+    def release(self, conn, discard: bool = False):
+        """Return a connection to the pool; broken or discarded connections are closed"""
+        with self._cond:
+            self._in_use -= 1
+            if discard or conn.closed:
+                self._close(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._reap_idle()
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (in-use connections are closed when released)"""
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._close(conn)
+            self.min_size = 0
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                **self.metrics,
+            }
+
+class StatementTimer:
+    """Context manager recording one statement's duration and row count in query_stats"""
+
+    def __init__(self, query):
+        self.query = query
+        self.rows = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self.start) * 1000
+        query_stats.record(self.query, duration_ms, self.rows, error=exc_type is not None)
+        return False
+
+class Transaction:
+    """Group of statements sharing one pooled connection and a single commit"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """Execute a SELECT query and return results"""
+        with StatementTimer(query) as timer, self.conn.cursor() as cursor:
+            cursor.execute(query, params)
+            results = [dict(row) for row in cursor.fetchall()]
+            timer.rows = len(results)
+            return results
+
+    def execute_insert(self, query: str, params: Optional[tuple] = None) -> Optional[Dict[str, Any]]:
+        """Execute an INSERT query and return the inserted row"""
+        with StatementTimer(query) as timer, self.conn.cursor() as cursor:
+            cursor.execute(query, params)
+            timer.rows = max(cursor.rowcount, 0)
+            result = cursor.fetchone() if cursor.description else None
+            return dict(result) if result else None
+
+    def execute_update(self, query: str, params: Optional[tuple] = None) -> int:
+        """Execute an UPDATE query and return affected rows count"""
+        with StatementTimer(query) as timer, self.conn.cursor() as cursor:
+            cursor.execute(query, params)
+            timer.rows = max(cursor.rowcount, 0)
+            return cursor.rowcount
+
+    def execute_many(self, query: str, rows: List[tuple], template: Optional[str] = None, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Insert many rows with multi-row INSERT statements.
+
+        The query must contain a single ``VALUES %s``; rows are sent page_size at
+        a time. If the query has a RETURNING clause the returned rows (e.g. the
+        new ids) are collected and returned in input order.
+        """
+        if not rows:
+            return []
+        with StatementTimer(query) as timer, self.conn.cursor() as cursor:
+            fetch = bool(_RETURNING.search(query))
+            results = execute_values(cursor, query, rows, template=template, page_size=page_size, fetch=fetch)
+            timer.rows = len(rows)
+            return [dict(row) for row in results] if fetch else []
+
+    def copy_rows(self, table: str, columns: List[str], rows) -> int:
+        """Stream rows into a table with COPY FROM STDIN and return the row count.
+
+        Faster than execute_many for large loads, but cannot return generated ids.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["\\N" if value is None else value for value in row])
+        buffer.seek(0)
+        statement = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')").format(
+            sql.Identifier(table),
+            sql.SQL(", ").join(sql.Identifier(column) for column in columns),
+        ).as_string(self.conn)
+        with StatementTimer(statement) as timer, self.conn.cursor() as cursor:
+            cursor.copy_expert(statement, buffer)
+            timer.rows = cursor.rowcount
+            return cursor.rowcount
+
+    def execute_pipeline(self, statements: List[tuple]) -> List[Dict[str, Any]]:
+        """Send several (query, params) statements in one round trip.
+
+        Only the result of the last statement is returned, so put the one
+        with a RETURNING clause (if any) at the end.
+        """
+        queries = ";\n".join(query for query, _ in statements)
+        with StatementTimer(queries) as timer, self.conn.cursor() as cursor:
+            cursor.execute(b";\n".join(cursor.mogrify(query, params) for query, params in statements))
+            results = [dict(row) for row in cursor.fetchall()] if cursor.description else []
+            timer.rows = len(results)
+            return results
+
 class PostgreSQLClient:
-    """PostgreSQL client for JunkStop app using the existing Replit database"""
-    
+    """PostgreSQL client for JunkStop app using the existing Replit database.
+
+    Reads issued through execute_query/iter_query go to the replicas listed in
+    DATABASE_REPLICA_URLS (comma separated) when configured; writes,
+    transactions and anything inside use_primary() stay on DATABASE_URL.
+    """
+
     def __init__(self):
         self.connection_string = os.getenv("DATABASE_URL")
-        
-    def get_connection(self):
+        self.replica_connection_strings = [
+            url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+        ]
+        self.replica_strategy = DB_REPLICA_STRATEGY
+        self._pool: Optional[ConnectionPool] = None
+        self._replica_pools: Optional[List[ConnectionPool]] = None
+        self._replica_down_until: Dict[int, float] = {}
+        self._next_replica = itertools.count()
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self) -> ConnectionPool:
+        # Created lazily so importing the module never opens a connection
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(self.connection_string)
+        return self._pool
+
+    @property
+    def replica_pools(self) -> List[ConnectionPool]:
+        if self._replica_pools is None:
+            with self._pool_lock:
+                if self._replica_pools is None:
+                    self._replica_pools = [ConnectionPool(url) for url in self.replica_connection_strings]
+        return self._replica_pools
+
+    def _pick_replica(self) -> Optional[int]:
+        """Index of the replica to read from, or None to use the primary"""
+        if not self.replica_connection_strings or _pin_primary.get():
+            return None
+        now = time.monotonic()
+        candidates = [
+            index for index in range(len(self.replica_pools))
+            if self._replica_down_until.get(index, 0) <= now
+        ]
+        if not candidates:
+            return None
+        if self.replica_strategy == "least_busy":
+            return min(candidates, key=lambda index: self.replica_pools[index].in_use)
+        return candidates[next(self._next_replica) % len(candidates)]
+
+    def _acquire(self, readonly: bool):
+        """Check out a connection, preferring a replica for read-only work"""
+        replica = self._pick_replica() if readonly else None
+        if replica is not None:
+            pool = self.replica_pools[replica]
+            try:
+                return pool, pool.acquire()
+            except (psycopg2.OperationalError, PoolExhaustedError) as e:
+                # Fall back to the primary and give the replica a moment to recover
+                print(f"Replica {replica} unavailable, reading from primary: {e}")
+                self._replica_down_until[replica] = time.monotonic() + DB_REPLICA_RETRY_AFTER
+        return self.pool, self.pool.acquire()
+
+    @contextmanager
+    def use_primary(self):
+        """Pin every read in this context (thread or async task) to the primary"""
+        token = _pin_primary.set(True)
+        try:
+            yield
+        finally:
+            _pin_primary.reset(token)
+
+    @contextmanager
+    def connection(self, readonly: bool = False):
+        """Borrow a pooled connection; commits on success, rolls back on error"""
+        start = time.perf_counter()
+        pool, conn = self._acquire(readonly)
+        query_stats.record_acquire((time.perf_counter() - start) * 1000)
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            pool.release(conn, discard=discard or conn.closed != 0)
+
+    @contextmanager
+    def transaction(self, readonly: bool = False):
+        """Run a group of statements on one connection, committed once on exit.
+
+        Transactions use the primary unless readonly=True.
+        """
+        with self.connection(readonly=readonly) as conn:
+            yield Transaction(conn)
+
+    def execute_many(self, query: str, rows: List[tuple], template: Optional[str] = None, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Insert many rows in one transaction; see Transaction.execute_many"""
+        with self.transaction() as tx:
+            return tx.execute_many(query, rows, template=template, page_size=page_size)
+
+    def copy_rows(self, table: str, columns: List[str], rows) -> int:
+        """Bulk load rows via COPY; see Transaction.copy_rows"""
+        with self.transaction() as tx:
+            return tx.copy_rows(table, columns, rows)
+
+    def get_connection(self, **kwargs):
+        """Open a dedicated, unpooled connection to the primary (caller is responsible for closing it)"""
         return psycopg2.connect(
             self.connection_string,
-            cursor_factory=RealDictCursor
+            cursor_factory=RealDictCursor,
+            **kwargs
         )
-    
+
+    def pool_stats(self) -> Dict[str, Any]:
+        stats = self.pool.stats()
+        if self.replica_connection_strings:
+            stats["replicas"] = [pool.stats() for pool in self.replica_pools]
+        return stats
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close_all()
+        for pool in self._replica_pools or []:
+            pool.close_all()
+
     def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
         """Execute a SELECT query and return results"""
-        with self.get_connection() as conn:
-            with conn.cursor() as cursor:
+        with self.transaction(readonly=True) as tx:
+            return tx.execute_query(query, params)
+
+    def iter_query(self, query: str, params: Optional[tuple] = None, fetch_size: int = DB_ITER_FETCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """Yield rows of a SELECT lazily from a named server-side cursor.
+
+        Only fetch_size rows are held in memory at a time. The pooled connection
+        stays checked out until the generator is exhausted or closed.
+        """
+        with self.connection(readonly=True) as conn:
+            with StatementTimer(query) as timer, conn.cursor(name=f"iter_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = fetch_size
                 cursor.execute(query, params)
-                results = cursor.fetchall()
-                return [dict(row) for row in results]
-    
+                for row in cursor:
+                    timer.rows += 1
+                    yield row
+
     def execute_insert(self, query: str, params: Optional[tuple] = None) -> Optional[Dict[str, Any]]:
         """Execute an INSERT query and return the inserted row"""
-        with self.get_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(query, params)
-                conn.commit()
-                result = cursor.fetchone()
-                return dict(result) if result else None
-    
+        with self.transaction() as tx:
+            return tx.execute_insert(query, params)
+
     def execute_update(self, query: str, params: Optional[tuple] = None) -> int:
         """Execute an UPDATE query and return affected rows count"""
-        with self.get_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(query, params)
-                conn.commit()
-                return cursor.rowcount
+        with self.transaction() as tx:
+            return tx.execute_update(query, params)
+
+def convert_numbered_params(query: str, args: tuple):
+    """Rewrite asyncpg-style $1, $2 placeholders into psycopg2 %s placeholders"""
+    params = []
+
+    def replace(match):
+        params.append(args[int(match.group(1)) - 1])
+        return "%s"
+
+    converted = _NUMBERED_PARAM.sub(replace, query.replace("%", "%%"))
+    return converted, tuple(params)
+
+class AsyncPostgreSQLClient:
+    """Async counterpart of PostgreSQLClient for use inside async route handlers.
+
+    Statements run on a bounded thread pool sized to the connection pool, so the
+    event loop keeps serving other requests while a query is in flight.
+    """
+
+    def __init__(self, client: PostgreSQLClient, max_workers: int = DB_ASYNC_WORKERS):
+        self.client = client
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="db")
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking database callable on the executor"""
+        loop = asyncio.get_running_loop()
+        # Carry the caller's context (and its call site, for the slow-query log) into the worker thread
+        context = contextvars.copy_context()
+        context.run(call_site_var.set, find_call_site())
+        return await loop.run_in_executor(self._executor, functools.partial(context.run, fn, *args, **kwargs))
+
+    async def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """Execute a SELECT query and return results"""
+        return await self.run(self.client.execute_query, query, params)
+
+    async def iter_query(self, query: str, params: Optional[tuple] = None, fetch_size: int = DB_ITER_FETCH_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """Async generator over a server-side cursor, fetching fetch_size rows per hop.
+
+        The pooled connection stays checked out until the generator finishes, so
+        don't hold one open while a slow client downloads; page with keyset
+        queries instead.
+        """
+        rows = self.client.iter_query(query, params, fetch_size)
+        fetch = None
+
+        async def close():
+            # A cancelled await doesn't stop the worker thread; let it finish before closing the generator
+            if fetch is not None and not fetch.done():
+                await asyncio.wait([fetch])
+            await self.run(rows.close)
+
+        try:
+            while True:
+                fetch = asyncio.ensure_future(self.run(lambda: list(itertools.islice(rows, fetch_size))))
+                batch = await asyncio.shield(fetch)
+                if not batch:
+                    break
+                for row in batch:
+                    yield row
+        finally:
+            # Shielded so cancelling the request can't skip closing the cursor and releasing the connection
+            await asyncio.shield(close())
+
+    async def execute_insert(self, query: str, params: Optional[tuple] = None) -> Optional[Dict[str, Any]]:
+        """Execute an INSERT query and return the inserted row"""
+        return await self.run(self.client.execute_insert, query, params)
+
+    async def execute_update(self, query: str, params: Optional[tuple] = None) -> int:
+        """Execute an UPDATE query and return affected rows count"""
+        return await self.run(self.client.execute_update, query, params)
+
+    async def execute_many(self, query: str, rows: List[tuple], template: Optional[str] = None, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Insert many rows with multi-row INSERT statements"""
+        return await self.run(self.client.execute_many, query, rows, template=template, page_size=page_size)
+
+    async def copy_rows(self, table: str, columns: List[str], rows) -> int:
+        """Bulk load rows via COPY FROM STDIN"""
+        return await self.run(self.client.copy_rows, table, columns, rows)
+
+    def use_primary(self):
+        """Pin reads to the primary; see PostgreSQLClient.use_primary"""
+        return self.client.use_primary()
+
+    async def run_in_transaction(self, fn, *args, **kwargs):
+        """Call fn(tx, *args) on the executor inside db_client.transaction().
+
+        The whole unit of work runs on one worker thread, so a transaction never
+        holds a pooled connection while waiting for the event loop.
+        """
+        def unit_of_work():
+            with self.client.transaction() as tx:
+                return fn(tx, *args, **kwargs)
+
+        return await self.run(unit_of_work)
+
+    async def execute(self, query: str, *args) -> int:
+        """Execute a statement using $1-style positional arguments"""
+        query, params = convert_numbered_params(query, args)
+        return await self.execute_update(query, params)
+
+    async def fetch(self, query: str, *args) -> List[Dict[str, Any]]:
+        """Fetch all rows using $1-style positional arguments"""
+        query, params = convert_numbered_params(query, args)
+        return await self.execute_query(query, params)
+
+    async def fetch_one(self, query: str, *args) -> Optional[Dict[str, Any]]:
+        """Fetch the first row using $1-style positional arguments"""
+        rows = await self.fetch(query, *args)
+        return rows[0] if rows else None
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.client.close()
 
-# Global client instance
-db_client = PostgreSQLClient()
\ No newline at end of file
+# Global client instances
+db_client = PostgreSQLClient()
+async_db_client = AsyncPostgreSQLClient(db_client)
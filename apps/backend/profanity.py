@@ -0,0 +1,106 @@
+import os
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Wordlist used by is_profane; see assets/profanity_wordlist.txt for the format
+PROFANITY_WORDLIST = os.getenv(
+    "PROFANITY_WORDLIST",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "profanity_wordlist.txt")
+)
+
+# Characters commonly swapped in to dodge filters, mapped back to the letters they stand for
+LEET_MAP = str.maketrans({
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b",
+    "@": "a", "$": "s", "!": "i", "+": "t", "|": "l",
+})
+
+_TOKEN = re.compile(r"[\w@$!+|]+")
+_END = ""  # trie key marking the end of a term
+_WORD = 1
+_PREFIX = 2
+
+def _deleet(match) -> str:
+    token = match.group(0)
+    if token.isdigit():
+        return token  # plain numbers aren't disguised words
+    # Trailing "!" etc. is punctuation ("damn!"), not a letter substitute
+    word = token.rstrip("!+|")
+    return word.translate(LEET_MAP) + " " * (len(token) - len(word))
+
+def normalize(text: str) -> str:
+    """Casefold, strip accents and undo leetspeak so variants of a term look the same"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN.sub(_deleet, text)
+
+def load_wordlist(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def _trie_pattern(node: Dict) -> str:
+    """Regex for a trie node; shared prefixes are written once, so matching cost doesn't grow with the list"""
+    if node.get(_END) == _PREFIX:
+        return r"\w*"  # any continuation of the word matches
+    branches = [
+        (r"\s+" if ch == " " else re.escape(ch)) + _trie_pattern(child)
+        for ch, child in sorted(item for item in node.items() if item[0] != _END)
+    ]
+    if not branches:
+        return ""
+    single_chars = [branch for branch in branches if len(branch) == 1]
+    if len(single_chars) > 1:
+        branches = [branch for branch in branches if len(branch) != 1] + ["[" + "".join(single_chars) + "]"]
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if node.get(_END) == _WORD:
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+class ProfanityMatcher:
+    """All terms compiled into one word-bounded regex over normalized text"""
+
+    def __init__(self, terms: Iterable[str]):
+        trie: Dict = {}
+        self.size = 0
+        for term in terms:
+            prefix = term.endswith("*")
+            term = " ".join(normalize(term.rstrip("*")).split())
+            if not term:
+                continue
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[_END] = _PREFIX if prefix else max(node.get(_END, _WORD), _WORD)
+            self.size += 1
+        self._regex = re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)") if self.size else None
+
+    @classmethod
+    def from_file(cls, path: str) -> "ProfanityMatcher":
+        return cls(load_wordlist(path))
+
+    def find(self, text: str) -> Optional[str]:
+        """The first match in the normalized text, or None"""
+        if self._regex is None or not text:
+            return None
+        normalized = normalize(text)
+        match = self._regex.search(normalized)
+        return match.group(0) if match else None
+
+    def contains(self, text: str) -> bool:
+        return self.find(text) is not None
+
+def _load_default_matcher() -> ProfanityMatcher:
+    try:
+        return ProfanityMatcher.from_file(PROFANITY_WORDLIST)
+    except OSError as e:
+        print(f"Failed to load profanity wordlist {PROFANITY_WORDLIST}: {e}")
+        return ProfanityMatcher([])
+
+# Global matcher, built once at import
+profanity_matcher = _load_default_matcher()
+
+def is_profane(text: str) -> bool:
+    return profanity_matcher.contains(text)
@@ -0,0 +1,143 @@
+import os
+import re
+import sys
+import threading
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Statements slower than this are printed together with the code that issued them
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Set by AsyncPostgreSQLClient before handing work to a thread, where the stack no longer shows the caller
+call_site_var: ContextVar[Optional[str]] = ContextVar("db_call_site", default=None)
+
+_INTERNAL_FILES = ("postgres_client.py", "query_stats.py", "contextlib.py", "threading.py", "thread.py")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=1024)
+def normalize_query(query) -> str:
+    """Collapse whitespace and literals so the same statement shape groups together"""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    query = _STRING_LITERAL.sub("?", query)
+    query = _NUMBER_LITERAL.sub("?", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+def find_call_site() -> str:
+    """Return 'file:line in function' for the first frame outside the database layer"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.endswith(_INTERNAL_FILES):
+            return f"{os.path.basename(filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+class Histogram:
+    """Fixed-bucket latency histogram (milliseconds)"""
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        index = 0
+        while index < len(HISTOGRAM_BUCKETS_MS) and value_ms > HISTOGRAM_BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def percentile(self, fraction: float) -> float:
+        """Approximate percentile as the upper bound of the bucket containing it"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return float(HISTOGRAM_BUCKETS_MS[index]) if index < len(HISTOGRAM_BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {f"le_{bound}": count for bound, count in zip(HISTOGRAM_BUCKETS_MS, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 2),
+            "avg_ms": round(self.total / self.count, 2) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 2),
+            "buckets": buckets,
+        }
+
+class QueryStats:
+    """Thread-safe per-statement timing, row counts and connection-acquire waits"""
+
+    def __init__(self, slow_query_ms: float = DB_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._queries: Dict[str, Dict[str, Any]] = {}
+            self._acquire_wait = Histogram()
+            self._slow_count = 0
+
+    def record(self, query, duration_ms: float, rows: int = 0, error: bool = False):
+        normalized = normalize_query(query)
+        with self._lock:
+            entry = self._queries.get(normalized)
+            if entry is None:
+                entry = self._queries[normalized] = {"histogram": Histogram(), "rows": 0, "errors": 0}
+            entry["histogram"].observe(duration_ms)
+            entry["rows"] += rows
+            if error:
+                entry["errors"] += 1
+            slow = duration_ms >= self.slow_query_ms
+            if slow:
+                self._slow_count += 1
+        if slow:
+            call_site = call_site_var.get() or find_call_site()
+            print(f"[SLOW QUERY] {duration_ms:.1f}ms rows={rows} at {call_site}: {normalized[:500]}")
+
+    def record_acquire(self, wait_ms: float):
+        with self._lock:
+            self._acquire_wait.observe(wait_ms)
+
+    def snapshot(self, top: int = 50) -> Dict[str, Any]:
+        """Statements ordered by total time spent, most expensive first"""
+        with self._lock:
+            queries = [
+                {"query": query, "rows": entry["rows"], "errors": entry["errors"], **entry["histogram"].to_dict()}
+                for query, entry in self._queries.items()
+            ]
+            acquire_wait = self._acquire_wait.to_dict()
+            slow_count = self._slow_count
+        queries.sort(key=lambda q: q["total_ms"], reverse=True)
+        return {
+            "slow_query_threshold_ms": self.slow_query_ms,
+            "slow_queries": slow_count,
+            "distinct_queries": len(queries),
+            "connection_acquire_wait": acquire_wait,
+            "queries": queries[:top],
+        }
+
+# Global stats instance shared by every client
+query_stats = QueryStats()
@@ -0,0 +1,116 @@
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Tuple
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException
+
+from auth import get_current_user
+from cache import TTLCache
+from redis_client import get_redis, redis_stats
+
+load_dotenv()
+
+# action -> (max calls, per seconds)
+RATE_LIMITS = {
+    'post': (5, 60),  # max 5 posts per 60 seconds
+    'reply': (10, 60),
+    'like': (20, 60),
+    'import': (5, 3600),
+}
+DEFAULT_RATE_LIMIT = (10, 60)
+
+# Upper bound on tracked (user, action) keys per process; idle keys also expire after two windows
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+def sliding_window_estimate(previous: int, current: int, elapsed: float, window: float) -> float:
+    """Calls in the last `window` seconds, assuming the previous window's calls were evenly spread"""
+    return previous * (1 - elapsed / window) + current
+
+def retry_after(previous: int, current: int, elapsed: float, limit: int, window: float) -> int:
+    """Seconds until the estimate drops below the limit again"""
+    if current < limit and previous:
+        wait = (1 - (limit - current) / previous) * window - elapsed
+    else:
+        wait = window - elapsed
+    return max(1, math.ceil(wait))
+
+class LocalRateLimitBackend:
+    """Sliding-window counters kept in this process: (window index, current count, previous count) per key"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self._windows = TTLCache(maxsize=max_keys, ttl=60.0)
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, limit: int, window: float) -> Tuple[bool, int]:
+        now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or state[0] < index - 1:
+                previous, current = 0, 0
+            elif state[0] == index - 1:
+                previous, current = state[1], 0
+            else:
+                previous, current = state[2], state[1]
+            if sliding_window_estimate(previous, current, elapsed, window) >= limit:
+                return False, retry_after(previous, current, elapsed, limit, window)
+            self._windows.set(key, (index, current + 1, previous), ttl=2 * window)
+        return True, 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "local", **self._windows.stats()}
+
+class RedisRateLimitBackend:
+    """Sliding-window counters in Redis, one expiring key per (key, window), shared by every worker"""
+
+    def __init__(self, redis):
+        self._redis = redis
+
+    async def hit(self, key: str, limit: int, window: float) -> Tuple[bool, int]:
+        now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+        current_key = f"ratelimit:{key}:{index}"
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incr(current_key)
+            pipe.pexpire(current_key, int(2 * window * 1000))
+            pipe.get(f"ratelimit:{key}:{index - 1}")
+            current, _, previous = await pipe.execute()
+        previous = int(previous or 0)
+        # current includes this call; undo it if the call is rejected
+        if sliding_window_estimate(previous, current - 1, elapsed, window) >= limit:
+            await self._redis.decr(current_key)
+            return False, retry_after(previous, current - 1, elapsed, limit, window)
+        return True, 0
+
+    def stats(self) -> Dict[str, Any]:
+        return redis_stats()
+
+def create_rate_limit_backend():
+    """Redis when REDIS_URL is configured and the client is installed, otherwise in-process"""
+    redis = get_redis()
+    return RedisRateLimitBackend(redis) if redis is not None else LocalRateLimitBackend()
+
+# Global rate limit backend
+rate_limiter = create_rate_limit_backend()
+
+async def enforce_rate_limit(action: str, user_id: int):
+    """Charge one call against RATE_LIMITS[action] for the user, raising 429 when over the limit"""
+    limit, window = RATE_LIMITS.get(action, DEFAULT_RATE_LIMIT)
+    allowed, wait = await rate_limiter.hit(f"{action}:{user_id}", limit, window)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded. Please wait.",
+            headers={"Retry-After": str(wait)}
+        )
+
+def rate_limit(action: str):
+    """Route dependency enforcing RATE_LIMITS[action] per authenticated user"""
+    async def check(current_user: dict = Depends(get_current_user)):
+        await enforce_rate_limit(action, current_user["id"])
+
+    return check
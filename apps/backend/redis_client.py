@@ -0,0 +1,27 @@
+import os
+from typing import Any, Dict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Optional Redis (or Redis-compatible) server that the feed cache and rate limits share between
+# workers; unset keeps both in-process
+REDIS_URL = os.getenv("REDIS_URL")
+
+_redis = None
+_unavailable = False
+
+def get_redis():
+    """The process-wide asyncio Redis client, or None when REDIS_URL is unset or the client can't be set up"""
+    global _redis, _unavailable
+    if _redis is None and REDIS_URL and not _unavailable:
+        try:
+            import redis.asyncio as redis  # optional dependency, only needed when REDIS_URL is set
+            _redis = redis.from_url(REDIS_URL)
+        except Exception as e:
+            _unavailable = True
+            print(f"Failed to set up Redis, keeping the feed cache and rate limits in-process: {e}")
+    return _redis
+
+def redis_stats() -> Dict[str, Any]:
+    return {"backend": "redis", "url": (REDIS_URL or "").split("@")[-1]}  # without credentials
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Per-user daily rollup of junk_food_logs (user_daily_stats) and the lifetime
+totals on users (total_logs, total_guilt_score, total_cost, total_calories).
+
+Log inserts and deletes keep both current in the same statement (see
+rollup_delta_sql and totals_delta_sql); this script rebuilds them from scratch
+or verifies them.
+
+Usage:
+    python rollup.py --check [--user-id N]      # list days and users that disagree with the logs
+    python rollup.py --backfill [--user-id N]   # rebuild the rollup and totals from junk_food_logs
+"""
+import argparse
+from typing import Any, Dict, List, Optional
+
+from postgres_client import db_client, PostgreSQLClient
+
+_AGGREGATES = """
+    COUNT(*) AS log_count,
+    COALESCE(SUM(guilt_rating), 0) AS guilt_sum,
+    COALESCE(SUM(regret_rating), 0) AS regret_sum,
+    COALESCE(SUM(estimated_cost), 0) AS cost_sum,
+    COALESCE(SUM(estimated_calories), 0) AS calories_sum
+"""
+_COLUMNS = ("log_count", "guilt_sum", "regret_sum", "cost_sum", "calories_sum")
+# users column -> the _AGGREGATES column it sums
+_USER_TOTALS = {
+    "total_logs": "log_count",
+    "total_guilt_score": "guilt_sum",
+    "total_cost": "cost_sum",
+    "total_calories": "calories_sum",
+}
+# Rows without an owner or timestamp have no (user_id, day) to roll up into
+_COUNTED = "user_id IS NOT NULL AND created_at IS NOT NULL"
+
+def rollup_delta_sql(source: str, sign: int = 1) -> str:
+    """Upsert adding (sign=1) or removing (sign=-1) the log rows in `source` to the rollup.
+
+    `source` is a table or CTE name with junk_food_logs columns, typically the
+    RETURNING rows of an INSERT or DELETE, so the rollup changes atomically with the logs.
+    """
+    return f"""
+        INSERT INTO user_daily_stats (user_id, day, {", ".join(_COLUMNS)})
+        SELECT user_id, day, {", ".join(f"{sign} * {column}" for column in _COLUMNS)}
+        FROM (
+            SELECT user_id, created_at::date AS day, {_AGGREGATES}
+            FROM {source}
+            WHERE {_COUNTED}
+            GROUP BY user_id, created_at::date
+        ) AS delta
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            {", ".join(f"{column} = user_daily_stats.{column} + EXCLUDED.{column}" for column in _COLUMNS)}
+    """
+
+def totals_delta_sql(source: str, sign: int = 1) -> str:
+    """UPDATE adding (sign=1) or removing (sign=-1) the log rows in `source` to their owners' lifetime totals"""
+    return f"""
+        UPDATE users SET
+            {", ".join(f"{total} = users.{total} + {sign} * delta.{column}" for total, column in _USER_TOTALS.items())}
+        FROM (
+            SELECT user_id, {_AGGREGATES}
+            FROM {source}
+            WHERE {_COUNTED}
+            GROUP BY user_id
+        ) AS delta
+        WHERE users.id = delta.user_id
+    """
+
+_RECOUNT_TOTALS = f"""
+    SELECT {_AGGREGATES}
+    FROM junk_food_logs
+    WHERE {_COUNTED} AND user_id = users.id
+"""
+
+def backfill(client: PostgreSQLClient = db_client, user_id: Optional[int] = None) -> int:
+    """Rebuild the rollup and user totals from junk_food_logs and return the number of day rows written"""
+    user_filter, params = (" AND user_id = %s", (user_id,)) if user_id is not None else ("", ())
+    with client.transaction() as tx:
+        # Block log writes until the rebuild commits so no insert or delete is counted twice or lost
+        tx.execute_update("LOCK TABLE junk_food_logs IN SHARE MODE")
+        tx.execute_update(
+            f"""
+            UPDATE users SET ({", ".join(_USER_TOTALS)}) = (
+                SELECT {", ".join(f"l.{column}" for column in _USER_TOTALS.values())}
+                FROM ({_RECOUNT_TOTALS}) AS l
+            )
+            WHERE TRUE{" AND id = %s" if user_id is not None else ""}
+            """,
+            params
+        )
+        tx.execute_update(f"DELETE FROM user_daily_stats WHERE TRUE{user_filter}", params)
+        return tx.execute_update(
+            f"""
+            INSERT INTO user_daily_stats (user_id, day, {", ".join(_COLUMNS)})
+            SELECT user_id, created_at::date, {_AGGREGATES}
+            FROM junk_food_logs
+            WHERE {_COUNTED}{user_filter}
+            GROUP BY user_id, created_at::date
+            """,
+            params
+        )
+
+def check(client: PostgreSQLClient = db_client, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Return every (user, day) where the rollup and a fresh aggregate of the logs disagree"""
+    user_filter, params = (" AND user_id = %s", (user_id,) * 2) if user_id is not None else ("", ())
+    with client.use_primary():
+        return client.execute_query(
+            f"""
+            SELECT
+                COALESCE(s.user_id, l.user_id) AS user_id,
+                COALESCE(s.day, l.day) AS day,
+                {", ".join(f"s.{column} AS rollup_{column}, l.{column} AS actual_{column}" for column in _COLUMNS)}
+            FROM (SELECT * FROM user_daily_stats WHERE TRUE{user_filter}) AS s
+            FULL OUTER JOIN (
+                SELECT user_id, created_at::date AS day, {_AGGREGATES}
+                FROM junk_food_logs
+                WHERE {_COUNTED}{user_filter}
+                GROUP BY user_id, created_at::date
+            ) AS l ON l.user_id = s.user_id AND l.day = s.day
+            WHERE ({", ".join(f"COALESCE(s.{column}, 0)" for column in _COLUMNS)})
+                IS DISTINCT FROM ({", ".join(f"COALESCE(l.{column}, 0)" for column in _COLUMNS)})
+            ORDER BY 1, 2
+            """,
+            params
+        )
+
+def check_totals(client: PostgreSQLClient = db_client, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Return every user whose lifetime totals disagree with a fresh aggregate of their logs"""
+    user_filter, params = (" AND id = %s", (user_id,)) if user_id is not None else ("", ())
+    with client.use_primary():
+        return client.execute_query(
+            f"""
+            SELECT
+                users.id AS user_id,
+                {", ".join(f"users.{total}, l.{column} AS actual_{total}" for total, column in _USER_TOTALS.items())}
+            FROM users
+            CROSS JOIN LATERAL ({_RECOUNT_TOTALS}) AS l
+            WHERE ({", ".join(f"users.{total}" for total in _USER_TOTALS)})
+                IS DISTINCT FROM ({", ".join(f"l.{column}" for column in _USER_TOTALS.values())}){user_filter}
+            ORDER BY 1
+            """,
+            params
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--check", action="store_true")
+    action.add_argument("--backfill", action="store_true")
+    parser.add_argument("--user-id", type=int)
+    args = parser.parse_args()
+
+    if args.backfill:
+        print(f"Rebuilt {backfill(user_id=args.user_id)} rollup row(s)")
+    else:
+        mismatches = check(user_id=args.user_id)
+        for row in mismatches:
+            print(row)
+        print(f"{len(mismatches)} mismatched day(s)" if mismatches else "Rollup is consistent with junk_food_logs")
+        mismatches = check_totals(user_id=args.user_id)
+        for row in mismatches:
+            print(row)
+        print(f"{len(mismatches)} user(s) with mismatched totals" if mismatches else "User totals are consistent with junk_food_logs")
@@ -0,0 +1,48 @@
+from datetime import date, datetime
+
+from analytics import LogArrays, heatmap, period_trends, daily_sums, rolling_averages, summarize
+
+NAN = float("nan")
+
+def epoch(*args) -> int:
+    return int((datetime(*args) - datetime(1970, 1, 1)).total_seconds())
+
+# (created_at, guilt, regret, cost, calories), ordered by created_at
+LOGS = LogArrays(*zip(
+    (epoch(2024, 12, 31, 23), 4, 2, 5.0, 300),
+    (epoch(2025, 1, 1, 8), NAN, 6, 2.5, NAN),
+    (epoch(2025, 1, 3, 8), 8, NAN, NAN, 500),
+))
+
+def test_period_trends():
+    assert period_trends(LOGS, "Y") == [
+        {"period": "2024", "count": 1, "avg_guilt": 4.0, "avg_regret": 2.0, "total_cost": 5.0, "total_calories": 300},
+        {"period": "2025", "count": 2, "avg_guilt": 8.0, "avg_regret": 6.0, "total_cost": 2.5, "total_calories": 500},
+    ]
+    assert [month["period"] for month in period_trends(LOGS, "M")] == ["2024-12", "2025-01"]
+
+def test_heatmap():
+    counts = heatmap(LOGS)
+    assert len(counts) == 7 and all(len(row) == 24 for row in counts)
+    assert counts[1][23] == 1  # Tuesday 2024-12-31 23:00
+    assert counts[2][8] == 1   # Wednesday 2025-01-01 08:00
+    assert counts[4][8] == 1   # Friday 2025-01-03 08:00
+    assert sum(map(sum, counts)) == 3
+
+def test_daily_sums_include_empty_days():
+    daily = daily_sums(LOGS, date(2024, 12, 31), date(2025, 1, 4))
+    assert daily["count"].tolist() == [1, 1, 0, 1, 0]
+    assert daily["guilt_count"].tolist() == [1, 0, 0, 1, 0]
+
+def test_rolling_averages():
+    start = date(2024, 12, 31)
+    days = rolling_averages(daily_sums(LOGS, start, date(2025, 1, 4)), start, 2)
+    assert [day["date"] for day in days] == ["2024-12-31", "2025-01-01", "2025-01-02", "2025-01-03", "2025-01-04"]
+    assert [day["avg_guilt"] for day in days] == [4.0, 4.0, None, 8.0, 8.0]
+    assert [day["avg_regret"] for day in days] == [2.0, 4.0, 6.0, None, None]
+
+def test_summarize_without_logs():
+    summary = summarize(LogArrays([], [], [], [], []), date(2025, 1, 1), date(2025, 1, 7))
+    assert summary["total_logs"] == 0
+    assert summary["monthly"] == []
+    assert summary["cost_projection"]["daily_average"] == 0
@@ -0,0 +1,57 @@
+import asyncio
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+from cache import TTLCache
+
+class StubClient:
+    """Stands in for async_db_client, serving users rows from a dict keyed by email"""
+
+    def __init__(self, users):
+        self.users = users
+        self.queries = 0
+
+    async def execute_query(self, query, params=None):
+        self.queries += 1
+        user = self.users.get(params[0])
+        return [dict(user)] if user else []
+
+def current_user(email):
+    token = auth.create_access_token({"sub": email})
+    return asyncio.run(auth.get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+
+def setup(monkeypatch, size=10):
+    users = {f"u{i}@x.com": {"id": i, "email": f"u{i}@x.com", "total_xp": 0} for i in range(1, 4)}
+    client = StubClient(users)
+    monkeypatch.setattr(auth, "async_db_client", client)
+    monkeypatch.setattr(auth, "_user_cache", TTLCache(maxsize=size, ttl=60))
+    monkeypatch.setattr(auth, "_user_ids", TTLCache(maxsize=size, ttl=60))
+    return users, client
+
+def test_repeat_requests_are_served_from_the_cache(monkeypatch):
+    users, client = setup(monkeypatch)
+    assert current_user("u1@x.com")["id"] == 1
+    current_user("u1@x.com")
+    assert client.queries == 1
+
+def test_invalidate_by_id_reaches_a_hot_user_in_a_full_cache(monkeypatch):
+    users, client = setup(monkeypatch, size=2)
+    for email in ("u1@x.com", "u2@x.com", "u1@x.com", "u3@x.com", "u1@x.com"):
+        current_user(email)
+    users["u1@x.com"]["total_xp"] = 50
+    auth.invalidate_cached_user(1)
+    assert current_user("u1@x.com")["total_xp"] == 50
+
+def test_changed_email_stops_matching_the_old_token(monkeypatch):
+    users, client = setup(monkeypatch)
+    current_user("u1@x.com")
+    users["new@x.com"] = {**users.pop("u1@x.com"), "email": "new@x.com"}
+    auth.invalidate_cached_user(1, "u1@x.com")
+    assert current_user("new@x.com")["id"] == 1
+    try:
+        current_user("u1@x.com")
+    except auth.HTTPException as e:
+        assert e.status_code == 401
+    else:
+        raise AssertionError("old email still authenticated")
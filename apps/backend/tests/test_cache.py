@@ -0,0 +1,35 @@
+import cache
+from cache import TTLCache
+
+def test_get_set_delete():
+    c = TTLCache(maxsize=10, ttl=60)
+    assert c.get("a") is None
+    assert c.get("a", "default") == "default"
+    c.set("a", 1)
+    assert c.get("a") == 1
+    assert c.delete("a")
+    assert not c.delete("a")
+    assert c.stats()["hits"] == 1 and c.stats()["misses"] == 2
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    c = TTLCache(maxsize=10, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2, ttl=5)
+    now[0] += 5
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    now[0] += 55
+    assert c.get("a") is None
+    assert len(c) == 0
+
+def test_least_recently_used_is_evicted():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")  # "b" is now the least recently used
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert c.stats()["evictions"] == 1
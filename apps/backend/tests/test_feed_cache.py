@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime
+
+from feed_cache import FeedCache, LocalCacheBackend
+
+def post(post_id, likes=0):
+    return {"id": post_id, "content": f"post {post_id}", "photo_url": None, "likes_count": likes,
+            "created_at": datetime(2025, 1, post_id), "replies_count": None, "user_id": 99}
+
+async def no_posts(ids):
+    raise AssertionError(f"unexpected reload of {ids}")
+
+def test_page_round_trip_keeps_only_user_independent_fields():
+    async def run():
+        cache = FeedCache(LocalCacheBackend())
+        key, cached = await cache.get_page(20, 0, None, no_posts)
+        assert cached is None
+        await cache.store_page(key, [post(2), post(1)], "next")
+        key, (posts, cursor) = await cache.get_page(20, 0, None, no_posts)
+        assert [p["id"] for p in posts] == [2, 1] and cursor == "next"
+        assert posts[0]["created_at"] == "2025-01-02T00:00:00" and posts[0]["replies_count"] == 0
+        assert "user_id" not in posts[0]
+        assert (cache.page_hits, cache.page_misses) == (1, 1)
+    asyncio.run(run())
+
+def test_invalidate_pages_retires_every_page():
+    async def run():
+        cache = FeedCache(LocalCacheBackend())
+        key, _ = await cache.get_page(20, 0, None, no_posts)
+        await cache.store_page(key, [post(1)], None)
+        await cache.invalidate_pages()
+        assert (await cache.get_page(20, 0, None, no_posts))[1] is None
+    asyncio.run(run())
+
+def test_page_loaded_across_an_invalidation_is_stored_as_stale():
+    async def run():
+        cache = FeedCache(LocalCacheBackend())
+        key, _ = await cache.get_page(20, 0, None, no_posts)
+        await cache.invalidate_pages()  # a post was created while the page was being queried
+        await cache.store_page(key, [post(1)], None)
+        assert (await cache.get_page(20, 0, None, no_posts))[1] is None
+    asyncio.run(run())
+
+def test_patch_post_updates_the_cached_row_only():
+    async def run():
+        cache = FeedCache(LocalCacheBackend())
+        key, _ = await cache.get_page(20, 0, None, no_posts)
+        await cache.store_page(key, [post(1, likes=3)], None)
+        await cache.patch_post(1, likes_count=4)
+        await cache.patch_post(2, likes_count=1)  # not cached: no-op
+        posts, _ = (await cache.get_page(20, 0, None, no_posts))[1]
+        assert posts[0]["likes_count"] == 4
+        assert (await cache.backend.get_many(["feed:post:2"])) == [None]
+    asyncio.run(run())
+
+def test_missing_rows_are_reloaded_and_deleted_ones_skipped():
+    async def run():
+        cache = FeedCache(LocalCacheBackend())
+        key, _ = await cache.get_page(20, 0, None, no_posts)
+        await cache.store_page(key, [post(3), post(2), post(1)], None)
+        await cache.invalidate_post(2)
+        await cache.invalidate_post(1)
+        reloads = []
+
+        async def load(ids):
+            reloads.append(ids)
+            return [post(post_id) for post_id in ids if post_id != 1]  # post 1 was deleted
+
+        posts, _ = (await cache.get_page(20, 0, None, load))[1]
+        assert reloads == [[2, 1]]
+        assert [p["id"] for p in posts] == [3, 2]
+    asyncio.run(run())
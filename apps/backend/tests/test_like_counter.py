@@ -0,0 +1,82 @@
+import asyncio
+
+from like_counter import LikeCounter
+
+class StubClient:
+    """Stands in for async_db_client: applies flushed deltas to an in-memory likes_count per post"""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.fail = False
+        self.gate = None  # an asyncio.Event that holds the write until set
+        self.writes = []
+
+    async def execute_many(self, query, rows, template=None):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.fail:
+            raise Exception("connection lost")
+        self.writes.append(rows)
+        for post_id, delta in rows:
+            self.counts[post_id] += delta
+        return [{"id": post_id, "likes_count": self.counts[post_id]} for post_id, _ in rows]
+
+def test_deltas_are_summed_into_one_write():
+    client = StubClient({1: 10, 2: 0})
+    counter = LikeCounter(client)
+    for delta in (1, 1, -1, 1):
+        counter.add(1, delta)
+    counter.add(2, 1)
+    counter.add(2, -1)  # nets to zero: nothing to write
+    assert counter.merge({"id": 1, "likes_count": 10})["likes_count"] == 12
+    assert asyncio.run(counter.flush()) == 1
+    assert client.writes == [[(1, 2)]]
+    assert client.counts[1] == 12
+    assert counter.pending(1) == 0
+
+def test_failed_flush_keeps_the_deltas_for_the_next_one():
+    client = StubClient({1: 5})
+    counter = LikeCounter(client)
+    counter.add(1, 1)
+    client.fail = True
+    assert asyncio.run(counter.flush()) == 0
+    assert counter.pending(1) == 1
+    counter.add(1, 1)
+    client.fail = False
+    asyncio.run(counter.flush())
+    assert client.counts[1] == 7
+
+def test_inflight_deltas_stay_visible_until_the_write_commits():
+    async def run():
+        client = StubClient({1: 3})
+        counter = LikeCounter(client)
+        client.gate = asyncio.Event()
+        counter.add(1, 1)
+        flush = asyncio.ensure_future(counter.flush())
+        await asyncio.sleep(0)
+        counter.add(1, 1)  # tapped while the first delta is being written
+        assert counter.merge({"id": 1, "likes_count": 3})["likes_count"] == 5
+        client.gate.set()
+        await flush
+        assert counter.merge({"id": 1, "likes_count": client.counts[1]})["likes_count"] == 5
+        client.gate = None
+        await counter.flush()
+        assert client.counts[1] == 5
+    asyncio.run(run())
+
+def test_stop_waits_for_a_running_flush_and_writes_the_rest():
+    async def run():
+        client = StubClient({1: 0})
+        counter = LikeCounter(client, interval_ms=1)
+        client.gate = asyncio.Event()
+        counter.add(1, 1)
+        counter.start()
+        await asyncio.sleep(0.01)  # the loop's flush is now waiting on the write
+        counter.add(1, 1)
+        stopping = asyncio.ensure_future(counter.stop())
+        await asyncio.sleep(0.01)
+        client.gate.set()
+        await stopping
+        assert client.counts[1] == 2
+        assert counter.pending(1) == 0
+    asyncio.run(run())
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+import pytest
+
+from log_import import parse_row
+
+NOW = datetime(2025, 6, 1, 12, 0)
+
+def test_valid_row():
+    row = parse_row(7, {
+        "created_at": "2025-05-31T18:30:00+02:00",
+        "food_type": "  Pizza ",
+        "guilt_rating": "7",
+        "regret_rating": 5,
+        "estimated_cost": "12.50",
+        "estimated_calories": "",
+        "location": "home",
+    }, NOW)
+    assert row == (7, datetime(2025, 5, 31, 16, 30), "Pizza", 7, 5, 12.5, None, "home")
+
+def test_optional_fields_default():
+    row = parse_row(7, {"created_at": "2025-05-31", "food_type": "Chips", "guilt_rating": 3, "regret_rating": 3}, NOW)
+    assert row == (7, datetime(2025, 5, 31), "Chips", 3, 3, 0, None, None)
+
+@pytest.mark.parametrize("fields, error", [
+    ({"food_type": "Chips", "guilt_rating": 3, "regret_rating": 3}, "Missing created_at"),
+    ({"created_at": "yesterday", "food_type": "Chips", "guilt_rating": 3, "regret_rating": 3}, "created_at must be an ISO 8601"),
+    ({"created_at": "2025-07-01", "food_type": "Chips", "guilt_rating": 3, "regret_rating": 3}, "created_at is in the future"),
+    ({"created_at": "2025-05-31", "food_type": "Chips", "guilt_rating": 11, "regret_rating": 3}, "guilt_rating must be between 1 and 10"),
+    ({"created_at": "2025-05-31", "food_type": "Chips", "guilt_rating": 2.5, "regret_rating": 3}, "guilt_rating must be an integer"),
+    ({"created_at": "2025-05-31", "food_type": "Chips", "guilt_rating": 3, "regret_rating": True}, "regret_rating must be an integer"),
+    ({"created_at": "2025-05-31", "food_type": "Chips", "guilt_rating": 3, "regret_rating": 3, "estimated_cost": "nan"}, "estimated_cost must be between"),
+    ({"created_at": "2025-05-31", "food_type": "x" * 256, "guilt_rating": 3, "regret_rating": 3}, "food_type is longer than 255"),
+])
+def test_invalid_rows(fields, error):
+    with pytest.raises(ValueError, match=error):
+        parse_row(7, fields, NOW)
@@ -0,0 +1,64 @@
+import asyncio
+
+import notifications
+from notifications import NotificationQueue
+
+class StubClient:
+    """Stands in for async_db_client: records each batch insert and returns the rows it "wrote" """
+
+    def __init__(self):
+        self.batches = []
+        self.failures = 0  # number of upcoming writes that fail
+        self.missing_users = set()  # recipients the INSERT skips, as if deleted
+
+    async def execute_many(self, query, rows, template=None):
+        if self.failures:
+            self.failures -= 1
+            raise Exception("connection lost")
+        self.batches.append(rows)
+        return [{"id": index, "user_id": row[0], "type": row[1], "message": row[4], "read": False}
+                for index, row in enumerate(rows) if row[0] not in self.missing_users]
+
+def test_without_a_worker_notifications_are_written_directly():
+    client = StubClient()
+    queue = NotificationQueue(client)
+    asyncio.run(queue.enqueue(1, "like", "Someone liked your post", post_id=3))
+    assert len(client.batches) == 1
+    assert client.batches[0][0][:5] == (1, "like", 3, None, "Someone liked your post")
+    assert queue.stats()["written"] == 1
+
+def test_queued_notifications_are_batched_and_drained_on_stop():
+    async def run():
+        client = StubClient()
+        queue = NotificationQueue(client, batch_size=3, batch_wait_ms=50)
+        queue.start()
+        for user_id in range(5):
+            await queue.enqueue(user_id, "reply", "New reply")
+        await queue.stop()
+        return client, queue
+
+    client, queue = asyncio.run(run())
+    assert [len(batch) for batch in client.batches] == [3, 2]
+    assert queue.stats()["batches"] == 2
+    assert queue.stats()["written"] == 5
+    assert queue.stats()["queued"] == 0
+
+def test_failed_writes_are_retried_then_dropped(monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFICATION_MAX_RETRIES", 2)
+    client = StubClient()
+    queue = NotificationQueue(client)
+    client.failures = 1
+    asyncio.run(queue.enqueue(1, "like", "retried"))
+    assert queue.stats()["written"] == 1 and queue.stats()["dropped"] == 0
+    client.failures = 2
+    asyncio.run(queue.enqueue(1, "like", "dropped"))
+    assert queue.stats()["dropped"] == 1
+
+def test_rows_for_deleted_recipients_are_counted_as_skipped():
+    client = StubClient()
+    client.missing_users = {2}
+    queue = NotificationQueue(client)
+    written = asyncio.run(queue._write([(1, "like", None, None, "a", None), (2, "like", None, None, "b", None)]))
+    assert [row["user_id"] for row in written] == [1]
+    assert queue.stats()["written"] == 1
+    assert queue.stats()["skipped"] == 1
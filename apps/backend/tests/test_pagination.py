@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from pagination import decode_cursor, encode_cursor, keyset_condition, keyset_page
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 3, 1, 12, 30, 45, 123456)
+    assert decode_cursor(encode_cursor({"created_at": created_at, "id": 42})) == (created_at, 42)
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "WzFd"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+def test_keyset_condition():
+    created_at = datetime(2025, 3, 1)
+    cursor = encode_cursor({"created_at": created_at, "id": 7})
+    assert keyset_condition(None) == ("", ())
+    assert keyset_condition(cursor) == (" AND (created_at, id) < (%s, %s)", (created_at, 7))
+    assert keyset_condition(cursor, descending=False)[0] == " AND (created_at, id) > (%s, %s)"
+
+def test_keyset_page():
+    rows = [{"created_at": datetime(2025, 3, day), "id": day} for day in (3, 2, 1)]
+    page, cursor = keyset_page(rows, 2)
+    assert page == rows[:2]
+    assert decode_cursor(cursor) == (datetime(2025, 3, 2), 2)
+    assert keyset_page(rows, 3) == (rows, None)
@@ -0,0 +1,149 @@
+import threading
+
+import psycopg2
+import pytest
+
+from postgres_client import ConnectionPool, PoolExhaustedError, PostgreSQLClient
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if not self.conn.alive:
+            raise Exception("server closed the connection unexpectedly")
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.alive = True
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+def fake_pool(**kwargs) -> ConnectionPool:
+    pool = ConnectionPool(None, **kwargs)
+    pool.opened = []
+
+    def connect():
+        conn = FakeConnection()
+        pool.opened.append(conn)
+        pool._count("connections_created")
+        return conn
+
+    pool._connect = connect
+    return pool
+
+def test_released_connections_are_reused():
+    pool = fake_pool(min_size=0, max_size=2)
+    conn = pool.acquire()
+    assert pool.in_use == 1
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(pool.opened) == 1
+    assert pool.stats()["acquired"] == 2
+
+def test_exhausted_pool_times_out():
+    pool = fake_pool(min_size=0, max_size=1)
+    pool.acquire()
+    with pytest.raises(PoolExhaustedError):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()["timeouts"] == 1
+    assert pool.in_use == 1
+
+def test_waiter_gets_the_released_connection():
+    pool = fake_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=2)))
+    waiter.start()
+    pool.release(conn)
+    waiter.join(2)
+    assert got == [conn]
+    assert pool.stats()["acquire_waits"] >= 1
+
+def test_dead_idle_connection_is_replaced():
+    pool = fake_pool(min_size=0, max_size=1, health_check_interval=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.alive = False
+    replacement = pool.acquire()
+    assert replacement is not conn and conn.closed
+    assert pool.in_use == 1
+    assert pool.stats()["health_check_failures"] == 1
+
+def test_discarded_and_closed_connections_free_their_slot():
+    pool = fake_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    pool.release(conn, discard=True)
+    assert conn.closed and pool.in_use == 0
+    conn = pool.acquire()
+    assert conn is pool.opened[1]
+
+def test_failed_connect_frees_the_slot():
+    pool = fake_pool(min_size=0, max_size=1)
+
+    def refuse():
+        raise Exception("connection refused")
+
+    pool._connect = refuse
+    with pytest.raises(Exception, match="refused"):
+        pool.acquire()
+    assert pool.in_use == 0
+
+def test_idle_connections_above_min_size_are_reaped():
+    pool = fake_pool(min_size=1, max_size=3, idle_timeout=0)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert pool.stats()["idle"] == 1
+    assert pool.stats()["idle_reaped"] == 1
+
+def replicated_client(replicas: int = 2, strategy: str = "round_robin") -> PostgreSQLClient:
+    client = PostgreSQLClient()
+    client.replica_connection_strings = [f"replica-{index}" for index in range(replicas)]
+    client.replica_strategy = strategy
+    client._pool = fake_pool(min_size=0)
+    client._replica_pools = [fake_pool(min_size=0) for _ in range(replicas)]
+    return client
+
+def test_reads_go_round_robin_across_replicas():
+    client = replicated_client()
+    pools = [client._acquire(readonly=True)[0] for _ in range(4)]
+    assert pools == client.replica_pools * 2
+
+def test_writes_and_pinned_reads_use_the_primary():
+    client = replicated_client()
+    assert client._acquire(readonly=False)[0] is client.pool
+    with client.use_primary():
+        assert client._acquire(readonly=True)[0] is client.pool
+    assert client._acquire(readonly=True)[0] is not client.pool
+
+def test_least_busy_picks_the_idlest_replica():
+    client = replicated_client(strategy="least_busy")
+    client.replica_pools[0].acquire()
+    assert client._acquire(readonly=True)[0] is client.replica_pools[1]
+
+def test_failed_replica_falls_back_to_the_primary_and_is_skipped():
+    client = replicated_client(replicas=1)
+
+    def refuse():
+        raise psycopg2.OperationalError("could not connect to server")
+
+    client.replica_pools[0]._connect = refuse
+    assert client._acquire(readonly=True)[0] is client.pool
+    # Marked down for DB_REPLICA_RETRY_AFTER, so the next read doesn't try it again
+    client.replica_pools[0]._connect = lambda: pytest.fail("replica retried too soon")
+    assert client._acquire(readonly=True)[0] is client.pool
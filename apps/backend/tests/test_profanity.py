@@ -0,0 +1,26 @@
+from profanity import ProfanityMatcher, normalize
+
+matcher = ProfanityMatcher(["badword", "shit*", "two words"])
+
+def test_whole_words_only():
+    assert matcher.contains("that is a badword")
+    assert matcher.contains("Badword!")
+    assert not matcher.contains("badwords are fine")
+    assert not matcher.contains("notabadword")
+
+def test_prefix_terms_match_any_continuation():
+    assert matcher.contains("shitty day")
+    assert not matcher.contains("bullshit")
+
+def test_leetspeak_and_accents():
+    assert matcher.contains("b4dw0rd")
+    assert matcher.contains("bádword")
+    assert normalize("D4MN!") == "damn "
+
+def test_multi_word_terms_allow_any_spacing():
+    assert matcher.contains("two   words")
+    assert not matcher.contains("twowords")
+
+def test_empty_matcher():
+    assert not ProfanityMatcher([]).contains("badword")
+    assert matcher.find("") is None
@@ -0,0 +1,34 @@
+import asyncio
+
+import rate_limit
+from rate_limit import LocalRateLimitBackend, retry_after, sliding_window_estimate
+
+def test_sliding_window_estimate():
+    assert sliding_window_estimate(10, 0, 0, 60) == 10
+    assert sliding_window_estimate(10, 2, 30, 60) == 7
+    assert sliding_window_estimate(10, 2, 60, 60) == 2
+
+def test_retry_after():
+    # 5 of 5 used this window: wait for the window to roll over
+    assert retry_after(0, 5, 20, 5, 60) == 40
+    # 3 now plus a decaying 4 from the last window: wait until 4 * (1 - t/60) < 2
+    assert retry_after(4, 3, 10, 5, 60) == 20
+    assert retry_after(0, 5, 59.9, 5, 60) == 1
+
+def test_local_backend_limits_within_window(monkeypatch):
+    now = [600.0]  # start of a 60s window
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    backend = LocalRateLimitBackend()
+
+    async def hits(key, count):
+        return [await backend.hit(key, 4, 60) for _ in range(count)]
+
+    assert asyncio.run(hits("post:1", 5)) == [(True, 0)] * 4 + [(False, 60)]
+    # Other keys have their own counters
+    assert asyncio.run(hits("post:2", 1)) == [(True, 0)]
+    # Half way into the next window the previous window's 4 calls still count for 2
+    now[0] = 690.0
+    assert asyncio.run(hits("post:1", 3)) == [(True, 0), (True, 0), (False, 1)]
+    # Two windows later the key starts over
+    now[0] = 810.0
+    assert asyncio.run(hits("post:1", 4)) == [(True, 0)] * 4